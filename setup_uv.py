@@ -3,18 +3,14 @@
 Setup script to install UV if not already installed.
 """
 
+import shutil
 import subprocess
 import sys
-from pathlib import Path
 
 
 def check_uv_installed():
     """Check if UV is installed."""
-    try:
-        subprocess.run(["uv", "--version"], capture_output=True, check=True)
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
+    return shutil.which("uv") is not None
 
 
 def install_uv():
@@ -38,15 +34,10 @@ def setup_project():
 
     print("Setting up project with UV...")
     try:
-        # Create virtual environment if it doesn't exist
-        venv_path = Path(".venv")
-        if not venv_path.exists():
-            print("Creating virtual environment...")
-            subprocess.run(["uv", "venv"], check=True)
-
-        # Install dependencies
+        # Create .venv if needed and install the project (editable) with its
+        # dependencies in a single resolver pass
         print("Installing dependencies...")
-        subprocess.run(["uv", "pip", "install", "-e", "."], check=True)
+        subprocess.run(["uv", "sync"], check=True)
 
         print("\nProject setup complete!")
         print("\nTo activate the virtual environment:")
@@ -0,0 +1,20 @@
+"""
+Shared async callback helpers for the transcription callback tests.
+A minimal stand-in for AudioSession's transcript handling, so tests need not build a session.
+"""
+
+import contextvars
+
+# Request-scoped value that must follow a transcript from stream start into the callback
+REQUEST_ID = contextvars.ContextVar("request_id", default=None)
+
+
+async def handle_transcript(ws, transcript):
+    """Forward a final transcript to the websocket, like AudioSession._handle_transcript."""
+    await ws.send_json(
+        {
+            "type": "final_transcript",
+            "text": transcript,
+            "request_id": REQUEST_ID.get(),
+        }
+    )
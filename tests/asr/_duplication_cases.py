@@ -0,0 +1,281 @@
+"""
+Shared transcript cases and helpers for the duplication tests.
+Used by both the logic-only suite and the provider-backed suite so they run the same data.
+"""
+
+import functools
+import hashlib
+from collections import OrderedDict, defaultdict
+
+# Near-duplicates are only scored against transcripts within this many characters
+_MAX_LENGTH_DELTA = 3
+
+# Word-set Jaccard similarity above which a transcript counts as a duplicate
+_SIMILARITY_THRESHOLD = 0.8
+
+# Punctuation that ends a complete sentence
+_SENTENCE_TERMINATORS = (".", "!", "?")
+
+# Deletes the punctuation ignored when comparing words
+_PUNCT_TABLE = str.maketrans("", "", ".,!?")
+
+# The problematic scenario from user logs: many similar transcripts in quick succession
+SIMILAR_TRANSCRIPTS = (
+    "I am wondering why it can take so long for this ethic.",
+    "I am wondering why it can take so long for this athlete.",
+    "I am wondering why it can take so long for this application.",
+    "I am wondering why I can take so long for this affiliation.",
+    "I am wondering why I can take so long for this athletic.",
+    "I am wondering why it can take so long for this athlete to start.",
+    "I am wondering why it can take so long for this application to start.",
+)
+
+# A sentence growing word by word, none of it punctuated as complete
+RAPID_CASES = (
+    "I would like",
+    "I would like to",
+    "I would like to make",
+    "I would like to make a",
+    "I would like to make a cup",
+    "I would like to make a cup of",
+    "I would like to make a cup of coffee",
+)
+
+# (transcript, should_be_duplicate) when words are compared as-is
+DUPLICATE_CASES = (
+    ("I would like to make a cup of coffee", False),  # First occurrence
+    ("I would like to make a cup of coffee", True),  # Exact duplicate
+    ("I would like to make a cup of coffee.", False),  # Minor variation - different enough
+    ("I would like to make a cup of tea", False),  # Different enough
+    ("I like coffee", False),  # Different topic
+    ("I like coffee", True),  # Exact duplicate again
+)
+
+# (transcript, should_be_duplicate) when punctuation is stripped from words
+NORMALIZED_DUPLICATE_CASES = (
+    ("I would like to make a cup of coffee", False),  # First occurrence
+    ("I would like to make a cup of coffee", True),  # Exact duplicate
+    ("I would like to make a cup of coffee.", True),  # Minor variation
+    ("I would like to make a cup of tea", False),  # Different enough
+)
+
+
+def normalize_word(word: str) -> str:
+    return word.translate(_PUNCT_TABLE).lower()
+
+
+@functools.lru_cache(maxsize=4096)
+def _normalize(transcript, strip_punctuation):
+    """Lowercased, stripped transcript and its comparison words, cached across calls."""
+    normalized = transcript.lower().strip()
+    if strip_punctuation:
+        return normalized, tuple(filter(None, map(normalize_word, normalized.split())))
+    return normalized, tuple(normalized.split())
+
+
+class TranscriptDeduper:
+    """Exact and near-duplicate detection for final transcripts.
+
+    Seen transcripts are bucketed by length, so a new transcript is only scored
+    against the few buckets within _MAX_LENGTH_DELTA characters rather than
+    against every transcript seen so far. Exact repeats are a dict lookup.
+
+    Word sets are stored as integer bitmasks over a shared vocabulary, so the
+    Jaccard intersection is one AND plus a popcount instead of a set walk.
+
+    At most ``capacity`` transcripts are kept; once full, the least recently
+    seen one is evicted so a long-running stream does not grow without bound.
+    The vocabulary only holds words of kept transcripts: each word counts the
+    transcripts using it, and its bit is recycled once the last one is
+    evicted, so masks stay as wide as the live vocabulary.
+    With ``strip_punctuation`` words are compared without ".,!?".
+    """
+
+    __slots__ = (
+        "_exact",
+        "_by_length",
+        "_vocab",
+        "_refs",
+        "_free_bits",
+        "_capacity",
+        "_strip_punctuation",
+    )
+
+    def __init__(self, capacity=1024, strip_punctuation=False):
+        self._exact = OrderedDict()
+        self._by_length = defaultdict(list)
+        self._vocab = {}
+        self._refs = {}
+        self._free_bits = []
+        self._capacity = capacity
+        self._strip_punctuation = strip_punctuation
+
+    def _mask(self, words):
+        """Mask over the words already in the vocabulary; others match no kept transcript."""
+        vocab = self._vocab
+        mask = 0
+        for word in words:
+            bit = vocab.get(word)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def _acquire(self, words):
+        """Mask over words, giving new words a bit and counting a use of each."""
+        vocab = self._vocab
+        refs = self._refs
+        free_bits = self._free_bits
+        mask = 0
+        for word in words:
+            bit = vocab.get(word)
+            if bit is None:
+                bit = vocab[word] = free_bits.pop() if free_bits else len(vocab)
+            refs[word] = refs.get(word, 0) + 1
+            mask |= 1 << bit
+        return mask
+
+    def _release(self, words):
+        vocab = self._vocab
+        refs = self._refs
+        for word in words:
+            if refs[word] == 1:
+                del refs[word]
+                self._free_bits.append(vocab.pop(word))
+            else:
+                refs[word] -= 1
+
+    def __len__(self):
+        return len(self._exact)
+
+    def __iter__(self):
+        for transcript, *_ in self._exact.values():
+            yield transcript
+
+    def check_and_add(self, transcript):
+        """Return True if transcript duplicates a seen one, otherwise record it."""
+        exact = self._exact
+        normalized, word_list = _normalize(transcript, self._strip_punctuation)
+        if normalized in exact:
+            exact.move_to_end(normalized)
+            return True
+
+        word_set = frozenset(word_list)
+        word_count = len(word_set)
+        length = len(transcript)
+        if word_count:
+            words = self._mask(word_set)
+            by_length = self._by_length
+            for candidate_length in range(
+                length - _MAX_LENGTH_DELTA, length + _MAX_LENGTH_DELTA + 1
+            ):
+                for _, _, seen_words, seen_count, _ in by_length.get(candidate_length, ()):
+                    if not seen_words:
+                        continue
+                    intersection = (words & seen_words).bit_count()
+                    union = word_count + seen_count - intersection
+                    if intersection / union > _SIMILARITY_THRESHOLD:
+                        return True
+
+        # Evict before acquiring, so freed bits can go straight to the new words
+        if len(exact) >= self._capacity:
+            self._evict(exact.popitem(last=False)[1])
+        entry = (transcript, length, self._acquire(word_set), word_count, word_set)
+        exact[normalized] = entry
+        self._by_length[length].append(entry)
+        return False
+
+    def _evict(self, entry):
+        length = entry[1]
+        bucket = self._by_length[length]
+        bucket.remove(entry)
+        if not bucket:
+            del self._by_length[length]
+        self._release(entry[4])
+
+
+def classify_finals(transcripts, confidences):
+    """Conservative final detection for a batch of transcripts without an is_final flag.
+
+    A transcript counts as final only with very high confidence, a sentence
+    terminator, and more than 20 characters; cheapest checks first.
+    """
+    return [
+        confidence > 0.95
+        and len(transcript) > 20
+        and transcript.rstrip().endswith(_SENTENCE_TERMINATORS)
+        for transcript, confidence in zip(transcripts, confidences)
+    ]
+
+
+class TranscriptBloom:
+    """Fixed-size Bloom filter for deduplicating final transcripts.
+
+    Memory stays constant however long the stream runs. The k bit positions
+    come from double hashing (h1 + i * h2) over a single blake2b digest; a
+    false positive drops a transcript, a false negative never happens.
+    """
+
+    __slots__ = ("_bits", "_size", "_hashes")
+
+    def __init__(self, size_bits=1 << 20, hashes=7):
+        self._bits = bytearray(size_bits // 8)
+        self._size = size_bits
+        self._hashes = hashes
+
+    def _positions(self, transcript):
+        digest = hashlib.blake2b(transcript.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self._size for i in range(self._hashes)]
+
+    def __contains__(self, transcript):
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(transcript))
+
+    def add(self, transcript):
+        for pos in self._positions(transcript):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def contains_or_add(self, transcript):
+        """Return True if transcript was (probably) seen before, otherwise record it."""
+        bits = self._bits
+        seen = True
+        for pos in self._positions(transcript):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                seen = False
+                bits[pos >> 3] |= mask
+        return seen
+
+
+class ConfirmedTranscriptBloom:
+    """TranscriptBloom whose hits are confirmed against the most recent transcripts.
+
+    A Bloom miss is always a new transcript, so most finals never reach the
+    exact check. A hit only counts as a repeat if the transcript is also among
+    the last ``capacity`` recorded, which an LRU holds like
+    TranscriptDeduper._exact; a false positive no longer drops a new final.
+    Both parts are bounded, so memory stays constant however long the stream
+    runs. A repeat older than the LRU window is let through again.
+    """
+
+    __slots__ = ("_bloom", "_recent", "_capacity")
+
+    def __init__(self, capacity=1024, size_bits=1 << 20, hashes=7):
+        self._bloom = TranscriptBloom(size_bits=size_bits, hashes=hashes)
+        self._recent = OrderedDict()
+        self._capacity = capacity
+
+    def __len__(self):
+        return len(self._recent)
+
+    def contains_or_add(self, transcript):
+        """Return True if transcript was recently seen, otherwise record it."""
+        recent = self._recent
+        if self._bloom.contains_or_add(transcript) and transcript in recent:
+            recent.move_to_end(transcript)
+            return True
+        recent[transcript] = None
+        if len(recent) > self._capacity:
+            recent.popitem(last=False)
+        return False
@@ -0,0 +1,54 @@
+import sys
+import types
+
+
+class _Message(types.SimpleNamespace):
+    """Stand-in for a cloud_speech proto message: keeps its fields as attributes."""
+
+
+class _SpeechClient:
+    """Stand-in for speech_v2.SpeechClient that never touches the network."""
+
+    def __init__(self, credentials=None, **kwargs):
+        self.credentials = credentials
+
+    def streaming_recognize(self, requests=None, **kwargs):
+        return iter(())
+
+
+def _speech_v2_stubs():
+    """Module stand-ins for google.cloud.speech_v2, exposing only what the provider uses."""
+    cloud_speech = types.ModuleType("google.cloud.speech_v2.types.cloud_speech")
+    for name in (
+        "RecognitionConfig",
+        "RecognitionFeatures",
+        "StreamingRecognitionConfig",
+        "StreamingRecognizeRequest",
+    ):
+        setattr(cloud_speech, name, type(name, (_Message,), {}))
+
+    class ExplicitDecodingConfig(_Message):
+        class AudioEncoding:
+            LINEAR16 = 1
+
+    class StreamingRecognitionFeatures(_Message):
+        class VoiceActivityTimeout(_Message):
+            pass
+
+    cloud_speech.ExplicitDecodingConfig = ExplicitDecodingConfig
+    cloud_speech.StreamingRecognitionFeatures = StreamingRecognitionFeatures
+
+    speech_types = types.ModuleType("google.cloud.speech_v2.types")
+    speech_types.cloud_speech = cloud_speech
+
+    speech_v2 = types.ModuleType("google.cloud.speech_v2")
+    speech_v2.SpeechClient = _SpeechClient
+    speech_v2.types = speech_types
+    return speech_v2, speech_types, cloud_speech
+
+
+# Installed once for the whole package. This has to happen at conftest import rather
+# than in a fixture: test modules import src.asr.google_speech_v2 at collection time,
+# before any fixture runs.
+for _module in _speech_v2_stubs():
+    sys.modules.setdefault(_module.__name__, _module)
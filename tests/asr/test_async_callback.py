@@ -0,0 +1,683 @@
+"""
+Unit tests for the async transcription callback fix.
+Tests the core async/sync callback issue and the dispatch fix without full module dependencies.
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import threading
+import unittest
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from tests.asr._callback_helpers import REQUEST_ID, handle_transcript
+
+# An un-awaited coroutine fails the test instead of warning at garbage collection
+pytestmark = pytest.mark.filterwarnings(
+    "error::RuntimeWarning", "error::pytest.PytestUnraisableExceptionWarning"
+)
+
+logger = logging.getLogger(__name__)
+
+# (callback_kind, dispatch) combinations checked by the dispatch matrix test
+DISPATCH_CASES = (
+    ("sync", "direct"),
+    ("sync", "queue"),
+    ("async", "direct"),
+    ("async", "await"),
+    ("async", "create_task"),
+    ("async", "queue"),
+)
+
+# Seconds an interim transcript may wait for newer partials before it is flushed
+INTERIM_FLUSH_INTERVAL = 0.05
+
+
+class CallbackDispatcher:
+    """Simplified version of the fix logic.
+
+    Whether the callback is a coroutine function is decided once, when it is
+    registered, and ``dispatch`` is bound to the matching path then: the
+    callback itself when it is sync, a queue handoff when it is async. The
+    streaming thread calls ``dispatch`` with no per-transcript branching.
+
+    Async callbacks are not given a task per transcript. Transcripts go onto a
+    bounded queue drained by one long-lived consumer task; a full queue raises
+    asyncio.QueueFull rather than piling up work behind a stalled consumer.
+    That check runs on the dispatching thread, so a burst can still find the
+    queue full by the time its puts reach the loop; those transcripts are
+    dropped there with a warning rather than lost in the loop's exception
+    handler.
+
+    An async callback must be registered from inside the event loop it should
+    run on. That loop is captured then, and dispatch hands transcripts to it
+    with call_soon_threadsafe, so the streaming response thread can dispatch.
+    The consumer task is created at registration too, so it runs every async
+    callback in a copy of the registering context: request-scoped ContextVars
+    set before registration are visible whichever thread dispatches.
+    """
+
+    __slots__ = ("callback", "is_coro", "loop", "queue", "consumer", "dispatch")
+
+    def __init__(self, callback, maxsize=256):
+        self.callback = callback
+        self.is_coro = asyncio.iscoroutinefunction(callback)
+        self.loop = self.queue = self.consumer = None
+        if self.is_coro:
+            self.loop = asyncio.get_running_loop()
+            self.queue = asyncio.Queue(maxsize=maxsize)
+            self.consumer = self.loop.create_task(self._drain())
+            self.dispatch = self._make_handoff()
+        else:
+            # Call sync callbacks directly
+            self.dispatch = callback
+
+    def __call__(self, transcript):
+        self.dispatch(transcript)
+
+    def _make_handoff(self):
+        full = self.queue.full
+        put = self._put
+        call_soon_threadsafe = self.loop.call_soon_threadsafe
+
+        def handoff(transcript):
+            # Hand over to the consumer on the captured loop, from any thread
+            if full():
+                raise asyncio.QueueFull
+            call_soon_threadsafe(put, transcript)
+
+        return handoff
+
+    def _put(self, transcript):
+        # Runs on the loop, after any number of other handoffs from the same burst
+        try:
+            self.queue.put_nowait(transcript)
+        except asyncio.QueueFull:
+            logger.warning("Callback queue full, dropping transcript %r", transcript)
+
+    async def _drain(self):
+        queue = self.queue
+        callback = self.callback
+        while (transcript := await queue.get()) is not None:
+            # One failing transcript must not stop delivery of the ones behind it
+            try:
+                await callback(transcript)
+            except Exception:
+                logger.exception("Transcription callback failed for %r", transcript)
+
+    async def close(self):
+        """Let the consumer finish the queued transcripts, then stop it."""
+        if self.consumer is not None:
+            # Yield once so handoffs already scheduled reach the queue before the sentinel
+            await asyncio.sleep(0)
+            await self.queue.put(None)
+            await self.consumer
+            self.consumer = None
+
+
+class AsyncCounter:
+    """Cheap async callback stub for tests that await it many times.
+
+    Pass ``record``: a bound coroutine method is recognised as async by
+    asyncio.iscoroutinefunction, whereas an instance with an async __call__
+    is not before Python 3.12.
+    """
+
+    __slots__ = ("count", "args")
+
+    def __init__(self):
+        self.count = 0
+        self.args = []
+
+    async def record(self, transcript):
+        self.count += 1
+        self.args.append(transcript)
+
+
+class InterimCoalescer:
+    """Hands only the latest interim transcript to the dispatcher, at a bounded cadence.
+
+    Partial results arrive at 10-20 Hz and most are superseded by the next one
+    before the UI could show them. The newest partial is held and flushed once
+    per interval instead of being dispatched each time. Final transcripts do
+    not go through here.
+
+    Like CallbackDispatcher this must be created inside the event loop, and may
+    then be called from the streaming response thread. The held partial and
+    the scheduled flag are shared by both threads, so they are only touched
+    under ``lock``.
+    """
+
+    __slots__ = ("dispatch", "loop", "interval", "lock", "latest", "flush_scheduled")
+
+    def __init__(self, dispatch, interval=INTERIM_FLUSH_INTERVAL):
+        self.dispatch = dispatch
+        self.loop = asyncio.get_running_loop()
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.latest = None
+        self.flush_scheduled = False
+
+    def __call__(self, transcript):
+        with self.lock:
+            self.latest = transcript
+            if self.flush_scheduled:
+                return
+            self.flush_scheduled = True
+        self.loop.call_soon_threadsafe(self.loop.call_later, self.interval, self.flush)
+
+    def flush(self):
+        """Dispatch the held partial now, if there is one. Call on the event loop."""
+        with self.lock:
+            transcript, self.latest = self.latest, None
+            self.flush_scheduled = False
+        if transcript is not None:
+            self.dispatch(transcript)
+
+
+class TestAsyncCallbackFix(unittest.IsolatedAsyncioTestCase):
+    """Test cases for async transcription callback handling."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Mocks are built once for the class and reset between uses
+        cls.sync_cb = Mock()
+        cls.async_cb = AsyncMock()
+
+    def setUp(self):
+        self.sync_cb.reset_mock()
+        self.async_cb.reset_mock()
+
+    async def test_callback_dispatch(self):
+        """Test every supported way of invoking sync and async callbacks."""
+        test_transcript = "Hello world"
+
+        async def dispatch(kind, how):
+            callback = self.sync_cb if kind == "sync" else self.async_cb
+            callback.reset_mock()
+
+            if how == "direct":
+                result = callback(test_transcript)
+                if kind == "async":
+                    # Calling an async callback without awaiting only creates a coroutine
+                    self.assertTrue(asyncio.iscoroutine(result))
+                    result.close()
+                    return callback
+            elif how == "await":
+                await callback(test_transcript)
+            elif how == "create_task":
+                await asyncio.create_task(callback(test_transcript))
+            else:
+                safe_call_callback = CallbackDispatcher(callback)
+                self.assertEqual(safe_call_callback.is_coro, kind == "async")
+                safe_call_callback(test_transcript)
+                await safe_call_callback.close()
+
+            callback.assert_called_once_with(test_transcript)
+            return callback
+
+        for kind, how in DISPATCH_CASES:
+            with self.subTest(callback_kind=kind, dispatch=how):
+                callback = await dispatch(kind, how)
+                if kind == "async" and how != "direct":
+                    callback.assert_awaited_once_with(test_transcript)
+
+    def test_async_callback_direct_call_fails(self):
+        """Test that calling async callback directly only creates a coroutine."""
+        # Create an async callback
+        async_callback = self.async_cb
+
+        # Try to call it synchronously (this should cause the issue)
+        test_transcript = "Hello world"
+
+        # This should NOT raise an error but create a coroutine that's never awaited
+        result = async_callback(test_transcript)
+
+        # The result should be a coroutine
+        self.assertTrue(inspect.iscoroutine(result))
+
+        # Close it so it is not left to raise RuntimeWarning when garbage collected
+        result.close()
+
+    async def test_proposed_fix_wrapper_function(self):
+        """Test the proposed fix: wrapping async callback in sync wrapper."""
+        # Create an async callback
+        async_callback = self.async_cb
+
+        # Create a sync wrapper that handles the async callback properly
+        def sync_wrapper(transcript: str):
+            """Sync wrapper for async callback."""
+            try:
+                # Schedule the async callback
+                return asyncio.create_task(async_callback(transcript))
+            except RuntimeError as e:
+                print(f"Error creating task: {e}")
+
+        # Test the wrapper
+        test_transcript = "Hello world"
+
+        with patch("asyncio.get_event_loop") as mock_get_event_loop:
+            task = sync_wrapper(test_transcript)
+        mock_get_event_loop.assert_not_called()
+        # Wait for the scheduled task itself
+        await task
+        async_callback.assert_called_once_with(test_transcript)
+
+    async def test_proposed_fix_asyncio_run(self):
+        """Test alternative fix: using asyncio.run() for async callback."""
+        # Create an async callback
+        async_callback = self.async_cb
+
+        # Create a sync wrapper that uses asyncio.run
+        def sync_wrapper_run(transcript: str):
+            """Sync wrapper that avoids double-calling the async callback."""
+            loop = asyncio.get_event_loop()
+            if loop.is_running():
+                return asyncio.create_task(async_callback(transcript))
+            asyncio.run(async_callback(transcript))
+
+        # Test the wrapper
+        test_transcript = "Hello world"
+
+        # Wait for the scheduled task itself
+        await sync_wrapper_run(test_transcript)
+        async_callback.assert_called_once_with(test_transcript)
+
+    def test_current_issue_simulation(self):
+        """Test that simulates the current RuntimeWarning issue."""
+
+        # Simulate the current problematic pattern
+        async def mock_handle_transcript(transcript: str):
+            """Mock async _handle_transcript method."""
+            await asyncio.sleep(0.01)  # Simulate async work
+            print(f"Processed transcript: {transcript}")
+
+        # This is what currently happens (problematic)
+        def problematic_callback(transcript: str):
+            """This is how the callback is currently called - causes RuntimeWarning."""
+            return mock_handle_transcript(transcript)  # Called without await!
+
+        # Test that this creates a coroutine object that's never awaited
+        result = problematic_callback("test transcript")
+
+        # The result should be a coroutine (this is the problem)
+        self.assertTrue(inspect.iscoroutine(result))
+
+        # This coroutine would be garbage collected without being awaited
+        # causing the RuntimeWarning we see in the logs, so close it here
+        result.close()
+
+    async def test_fix_simulation(self):
+        """Test the proposed fix for the async callback issue."""
+        # Mock async _handle_transcript
+        async_callback = self.async_cb
+
+        # Fixed callback wrapper
+        def fixed_transcription_callback(transcript: str):
+            """Fixed callback that properly handles async callback."""
+            try:
+                task = asyncio.create_task(async_callback(transcript))
+                return task
+            except Exception as e:
+                print(f"Error in fixed callback: {e}")
+
+        # Test the fix
+        test_transcript = "Hello world"
+
+        # Call the fixed callback
+        with patch("asyncio.get_event_loop") as mock_get_event_loop:
+            task = fixed_transcription_callback(test_transcript)
+        mock_get_event_loop.assert_not_called()
+
+        # Wait for the async work to complete
+        if task and hasattr(task, "__await__"):
+            await task
+
+        # Verify the async callback was called
+        async_callback.assert_called_once_with(test_transcript)
+
+
+class TestCallbackDispatcher(unittest.IsolatedAsyncioTestCase):
+    """Test the cached-flag, queue-backed dispatcher."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sync_cb = Mock()
+        cls.async_cb = AsyncMock()
+
+    def setUp(self):
+        self.sync_cb.reset_mock()
+        self.async_cb.reset_mock()
+
+    def test_dispatch_uses_cached_coroutine_flag(self):
+        """Test that dispatching does not re-inspect the callback per transcript."""
+        sync_callback = self.sync_cb
+        safe_call_callback = CallbackDispatcher(sync_callback)
+
+        with patch("asyncio.iscoroutinefunction") as mock_iscoro:
+            for i in range(10):
+                safe_call_callback(f"transcript {i}")
+
+        mock_iscoro.assert_not_called()
+        self.assertEqual(sync_callback.call_count, 10)
+
+    async def test_dispatch_is_bound_at_registration(self):
+        """Test that dispatch uses only what was bound when the callback was registered."""
+        sync_received = []
+        async_counter = AsyncCounter()
+
+        sync_dispatcher = CallbackDispatcher(sync_received.append)
+        async_dispatcher = CallbackDispatcher(async_counter.record)
+
+        # Sync callbacks are dispatched by calling them, with nothing in between
+        self.assertIs(sync_dispatcher.dispatch, sync_dispatcher.callback)
+
+        # The async handoff holds its own references to the queue and loop methods,
+        # so replacing the attributes after registration must not affect it
+        loop = asyncio.get_running_loop()
+        with (
+            patch("asyncio.iscoroutinefunction") as mock_iscoro,
+            patch.object(async_dispatcher.queue, "full") as mock_full,
+            patch.object(loop, "call_soon_threadsafe") as mock_call_soon,
+        ):
+            for i in range(10):
+                sync_dispatcher(i)
+                async_dispatcher(i)
+
+        mock_iscoro.assert_not_called()
+        mock_full.assert_not_called()
+        mock_call_soon.assert_not_called()
+
+        await async_dispatcher.close()
+        self.assertEqual(sync_received, list(range(10)))
+        self.assertEqual(async_counter.args, list(range(10)))
+
+    async def test_async_dispatch_uses_single_consumer_task(self):
+        """Test that many async dispatches share one consumer task."""
+        async_counter = AsyncCounter()
+        safe_call_callback = CallbackDispatcher(async_counter.record)
+        for i in range(1000):
+            safe_call_callback(f"transcript {i}")
+            if i % 50 == 49:
+                await asyncio.sleep(0)  # Let the consumer drain
+
+        # The running test plus the one consumer
+        self.assertEqual(len(asyncio.all_tasks()), 2)
+
+        await safe_call_callback.close()
+        self.assertEqual(async_counter.count, 1000)
+        self.assertEqual(async_counter.args[-1], "transcript 999")
+
+    async def test_async_dispatch_queue_is_bounded(self):
+        """Test that a stalled consumer pushes back instead of queueing without limit."""
+        release = asyncio.Event()
+        received = []
+
+        async def stalled_callback(transcript):
+            received.append(transcript)
+            await release.wait()
+
+        safe_call_callback = CallbackDispatcher(stalled_callback, maxsize=2)
+        safe_call_callback("one")  # Taken by the consumer, which then stalls
+        await asyncio.sleep(0)
+        safe_call_callback("two")
+        safe_call_callback("three")
+        await asyncio.sleep(0)
+        with self.assertRaises(asyncio.QueueFull):
+            safe_call_callback("four")
+
+        release.set()
+        await safe_call_callback.close()
+        self.assertEqual(received, ["one", "two", "three"])
+
+    async def test_threaded_burst_into_full_queue_is_not_lost_silently(self):
+        """Test that handoffs which find the queue full on the loop are dropped with a warning."""
+        release = asyncio.Event()
+        received = []
+
+        async def stalled_callback(transcript):
+            received.append(transcript)
+            await release.wait()
+
+        safe_call_callback = CallbackDispatcher(stalled_callback, maxsize=2)
+        safe_call_callback("t0")  # Taken by the consumer, which then stalls
+        await asyncio.sleep(0)
+
+        # Block the loop while the streaming thread dispatches, so every full() check
+        # passes and all nine puts are waiting for the loop at once
+        def burst():
+            for i in range(1, 10):
+                safe_call_callback(f"t{i}")
+
+        worker = threading.Thread(target=burst)
+        worker.start()
+        worker.join()
+
+        with self.assertLogs(logger, logging.WARNING) as logs:
+            await asyncio.sleep(0)
+        self.assertEqual(len(logs.records), 7)
+
+        release.set()
+        await safe_call_callback.close()
+        self.assertEqual(received, ["t0", "t1", "t2"])
+
+    async def test_consumer_survives_failing_callback(self):
+        """Test that a callback error is logged and later transcripts are still delivered."""
+        received = []
+
+        async def flaky_callback(transcript):
+            if transcript == "bad":
+                raise ValueError(transcript)
+            received.append(transcript)
+
+        safe_call_callback = CallbackDispatcher(flaky_callback)
+        with self.assertLogs(logger, logging.ERROR) as logs:
+            for transcript in ("bad", "good1", "good2"):
+                safe_call_callback(transcript)
+            await safe_call_callback.close()
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(received, ["good1", "good2"])
+
+    async def test_async_callback_sees_registration_context(self):
+        """Test that a ContextVar set before registration reaches the async callback."""
+        seen = []
+
+        async def async_callback(transcript):
+            seen.append((transcript, REQUEST_ID.get()))
+
+        token = REQUEST_ID.set("request-1")
+        safe_call_callback = CallbackDispatcher(async_callback)
+        REQUEST_ID.reset(token)
+
+        # Dispatch from a worker thread, which has no request id of its own
+        await asyncio.get_running_loop().run_in_executor(None, safe_call_callback, "hello")
+        await safe_call_callback.close()
+
+        self.assertEqual(seen, [("hello", "request-1")])
+
+    async def test_interims_are_coalesced(self):
+        """Test that a burst of interim transcripts reaches the callback only as its latest."""
+        received = []
+        # The timer never fires during the test; each interval ends with an explicit flush
+        coalescer = InterimCoalescer(CallbackDispatcher(received.append).dispatch, interval=3600)
+
+        # 100 rapid partials from the streaming thread, in two bursts one interval apart
+        def burst(start):
+            for i in range(start, start + 50):
+                coalescer(f"partial {i}")
+
+        loop = asyncio.get_running_loop()
+        for start in (0, 50):
+            await loop.run_in_executor(None, burst, start)
+            self.assertTrue(coalescer.flush_scheduled)
+            coalescer.flush()
+
+        self.assertEqual(received, ["partial 49", "partial 99"])
+
+        # Nothing is held, so a further flush dispatches nothing
+        coalescer.flush()
+        self.assertEqual(received, ["partial 49", "partial 99"])
+
+    async def test_coalesced_interims_reach_async_callback(self):
+        """Test that coalesced interims are delivered to an async callback through the queue."""
+        safe_call_callback = CallbackDispatcher(self.async_cb)
+        coalescer = InterimCoalescer(safe_call_callback.dispatch, interval=3600)
+
+        for i in range(100):
+            coalescer(f"partial {i}")
+        coalescer.flush()
+        await safe_call_callback.close()
+
+        self.async_cb.assert_awaited_once_with("partial 99")
+
+    def test_inspection_works(self):
+        """Test that function inspection works correctly."""
+
+        def sync_func(x):
+            return x
+
+        async def async_func(x):
+            return x
+
+        self.assertFalse(inspect.iscoroutinefunction(sync_func))
+        self.assertTrue(inspect.iscoroutinefunction(async_func))
+
+    async def test_no_more_runtime_warnings(self):
+        """Test that the fix eliminates RuntimeWarnings."""
+
+        async def mock_async_callback(transcript):
+            await asyncio.sleep(0.01)
+            print(f"Processed: {transcript}")
+
+        def old_problematic_way(transcript):
+            # This would cause RuntimeWarning
+            return mock_async_callback(transcript)
+
+        # This should not cause RuntimeWarning
+        new_fixed_way = CallbackDispatcher(mock_async_callback)
+
+        # Test old way creates coroutine
+        result = old_problematic_way("test")
+        self.assertTrue(inspect.iscoroutine(result))
+        result.close()
+
+        # Test new way doesn't return coroutine
+        result = new_fixed_way("test")
+        self.assertIsNone(result)  # The consumer task awaits the callback
+        await new_fixed_way.close()
+
+
+class TestIntegrationScenario(unittest.IsolatedAsyncioTestCase):
+    """Integration test scenarios for the callback fix."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.mock_websocket = AsyncMock()
+
+    def setUp(self):
+        self.mock_websocket.reset_mock()
+
+    async def test_websocket_callback_scenario(self):
+        """Test the complete WebSocket callback scenario."""
+        mock_websocket = self.mock_websocket
+
+        # Create the problematic callback (current implementation)
+        def problematic_callback(transcript: str):
+            """Current problematic implementation."""
+            return handle_transcript(mock_websocket, transcript)  # Not awaited!
+
+        # Create the fixed callback
+        def fixed_callback(transcript: str):
+            """Fixed implementation."""
+            try:
+                return asyncio.create_task(handle_transcript(mock_websocket, transcript))
+            except Exception as e:
+                print(f"Error in fixed callback: {e}")
+
+        # Test problematic approach
+        result = problematic_callback("test transcript")
+        # This creates a coroutine that's never awaited
+        self.assertTrue(inspect.iscoroutine(result))
+        result.close()
+
+        # Test fixed approach, waiting for the scheduled task itself
+        await fixed_callback("test transcript 2")
+
+        # Verify websocket was called in fixed version
+        mock_websocket.send_json.assert_called()
+        call_args = mock_websocket.send_json.call_args[0][0]
+        self.assertEqual(call_args["text"], "test transcript 2")
+
+    async def test_complete_fix_simulation(self):
+        """Test the complete fix end-to-end, dispatching from a worker thread."""
+        mock_websocket = self.mock_websocket
+
+        # Captured once, as start_streaming does, for dispatch from other threads
+        loop = asyncio.get_running_loop()
+        token = REQUEST_ID.set("request-1")
+        context = contextvars.copy_context()
+        REQUEST_ID.reset(token)
+
+        # Tasks created on the loop for handed-over transcripts
+        pending = []
+
+        def schedule(coro):
+            pending.append(loop.create_task(coro))
+
+        # Create the fixed sync wrapper
+        def fixed_transcription_callback(transcript: str):
+            """Fixed transcription callback that properly handles async _handle_transcript."""
+            try:
+                loop.call_soon_threadsafe(
+                    schedule, handle_transcript(mock_websocket, transcript), context=context
+                )
+            except Exception as e:
+                print(f"Error in callback: {e}")
+
+        # Test the fixed callback from a worker thread, as the streaming responses arrive
+        test_transcript = "Hello world"
+        await loop.run_in_executor(None, fixed_transcription_callback, test_transcript)
+
+        # The handoff runs before the executor result is delivered, so the task exists
+        await asyncio.gather(*pending)
+
+        # Verify the websocket send was called
+        mock_websocket.send_json.assert_called()
+
+        # Check the call arguments
+        call_args = mock_websocket.send_json.call_args[0][0]
+        self.assertEqual(call_args["type"], "final_transcript")
+        self.assertEqual(call_args["text"], test_transcript)
+        self.assertEqual(call_args["request_id"], "request-1")
+
+    async def test_websocket_scenario_fixed(self):
+        """Test that the websocket scenario works with the dispatcher."""
+        mock_websocket = self.mock_websocket
+
+        # Apply the fix
+        fixed_transcription_callback = CallbackDispatcher(
+            functools.partial(handle_transcript, mock_websocket)
+        )
+
+        # Test the fixed callback from a worker thread, as the streaming responses arrive
+        test_transcript = "test transcript"
+        await asyncio.get_running_loop().run_in_executor(
+            None, fixed_transcription_callback, test_transcript
+        )
+
+        # Closing waits for the consumer to finish the queued transcript
+        await fixed_transcription_callback.close()
+
+        # Verify websocket was called
+        mock_websocket.send_json.assert_called()
+        call_args = mock_websocket.send_json.call_args[0][0]
+        self.assertEqual(call_args["text"], test_transcript)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,86 +4,124 @@ Tests that we correctly handle the is_final (snake_case) field.
 """
 
 import unittest
+from operator import itemgetter
 
+# Sentinel for attribute probes, so a missing attribute costs no AttributeError
+_MISSING = object()
 
-class TestCorrectedIsFinalFix(unittest.TestCase):
-    """Test the corrected is_final attribute fix for Google Speech v2 Python gRPC API."""
+# Fetches the fields the stream filter reads from each item in one C-level call
+_STREAM_FIELDS = itemgetter("transcript", "is_final", "confidence")
 
-    def test_correct_isfinal_attribute_detection(self):
-        """Test that we correctly detect the is_final attribute in Google Speech v2 Python gRPC responses."""
 
-        # Mock response structure for Google Speech v2 Python gRPC API
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
+# Mock response structure for Google Speech v2 Python gRPC API
+class MockAlternative:
+    __slots__ = ("transcript", "confidence")
 
-        class MockResult:
-            def __init__(self, alternatives, **kwargs):
-                self.alternatives = alternatives
-                for key, value in kwargs.items():
-                    setattr(self, key, value)
+    def __init__(self, transcript, confidence):
+        self.transcript = transcript
+        self.confidence = confidence
 
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
 
-        # Test scenarios with different attribute names
-        test_scenarios = [
-            {
-                "name": "Google Speech v2 Python gRPC with is_final=True",
-                "result": MockResult([MockAlternative("Hello world", 0.9)], is_final=True),
-                "should_process": True,
-                "description": "Should process final result with is_final=True",
-            },
-            {
-                "name": "Google Speech v2 Python gRPC with is_final=False",
-                "result": MockResult([MockAlternative("Hello", 0.8)], is_final=False),
-                "should_process": False,
-                "description": "Should ignore interim result with is_final=False",
-            },
-            {
-                "name": "REST API style with isFinal=True",
-                "result": MockResult([MockAlternative("Hello world", 0.9)], isFinal=True),
-                "should_process": True,
-                "description": "Should process final result with REST API style isFinal=True",
-            },
-            {
-                "name": "No final indicator",
-                "result": MockResult([MockAlternative("Hello world", 0.9)]),
-                "should_process": True,  # Falls back to deduplication logic
-                "description": "Should process if no final indicator (falls back to deduplication)",
-            },
-        ]
+class MockResult:
+    __slots__ = ("alternatives", "is_final", "isFinal")
+
+    def __init__(self, alternatives, is_final=_MISSING, isFinal=_MISSING):
+        self.alternatives = alternatives
+        # Leave omitted flags unset so attribute probes see them as absent
+        if is_final is not _MISSING:
+            self.is_final = is_final  # Python gRPC style
+        if isFinal is not _MISSING:
+            self.isFinal = isFinal  # REST API style
+
+
+class MockResponse:
+    __slots__ = ("results",)
+
+    def __init__(self, results):
+        self.results = results
+
+
+def should_process_response_v2(response):
+    """Corrected logic matching the actual implementation."""
+    if not response.results:
+        return False
+
+    result = response.results[0]
+    if not result.alternatives:
+        return False
+
+    # Check multiple possible final indicators - Google Speech v2 Python gRPC API uses is_final (snake_case)
+    is_final_result = getattr(result, "is_final", _MISSING)
+    if is_final_result is _MISSING:
+        # Fallback for REST API style, then to deduplication logic
+        is_final_result = getattr(result, "isFinal", True)
+
+    alternative = result.alternatives[0]
+    confidence = getattr(alternative, "confidence", 0.0)
+    transcript = alternative.transcript.strip()
 
-        def should_process_response_v2(response):
-            """Corrected logic matching the actual implementation."""
-            if not response.results:
-                return False
+    return is_final_result and confidence > 0.5 and len(transcript) > 0
 
-            result = response.results[0]
-            if not result.alternatives:
-                return False
 
-            # Check multiple possible final indicators - Google Speech v2 Python gRPC API uses is_final (snake_case)
-            is_final_result = False
+def process_with_corrected_fix(stream):
+    """Process stream with the corrected is_final fix."""
+    # Check is_final first: most stream items are interim and never reach strip()
+    return [
+        transcript
+        for transcript, is_final, confidence in map(_STREAM_FIELDS, stream)
+        if is_final and confidence > 0.5 and transcript.strip()
+    ]
 
-            if hasattr(result, "is_final"):
-                is_final_result = result.is_final
-            elif hasattr(result, "isFinal"):  # Fallback for REST API style
-                is_final_result = result.isFinal
-            else:
-                # Falls back to deduplication logic
-                is_final_result = True
 
-            alternative = result.alternatives[0]
-            confidence = getattr(alternative, "confidence", 0.0)
-            transcript = alternative.transcript.strip()
+def get_is_final_value(response):
+    """Extract is_final value using the same logic as our implementation."""
+    if not response.results:
+        return False
 
-            return is_final_result and confidence > 0.5 and len(transcript) > 0
+    result = response.results[0]
 
-        # Test each scenario
-        for scenario in test_scenarios:
+    # Google Speech v2 Python gRPC API uses is_final (snake_case)
+    is_final = getattr(result, "is_final", _MISSING)
+    if is_final is _MISSING:  # Fallback for REST API style
+        is_final = getattr(result, "isFinal", False)
+
+    return is_final
+
+
+class TestCorrectedIsFinalFix(unittest.TestCase):
+    """Test the corrected is_final attribute fix for Google Speech v2 Python gRPC API."""
+
+    # Test scenarios with different attribute names
+    SCENARIOS = [
+        {
+            "name": "Google Speech v2 Python gRPC with is_final=True",
+            "result": MockResult([MockAlternative("Hello world", 0.9)], is_final=True),
+            "should_process": True,
+            "description": "Should process final result with is_final=True",
+        },
+        {
+            "name": "Google Speech v2 Python gRPC with is_final=False",
+            "result": MockResult([MockAlternative("Hello", 0.8)], is_final=False),
+            "should_process": False,
+            "description": "Should ignore interim result with is_final=False",
+        },
+        {
+            "name": "REST API style with isFinal=True",
+            "result": MockResult([MockAlternative("Hello world", 0.9)], isFinal=True),
+            "should_process": True,
+            "description": "Should process final result with REST API style isFinal=True",
+        },
+        {
+            "name": "No final indicator",
+            "result": MockResult([MockAlternative("Hello world", 0.9)]),
+            "should_process": True,  # Falls back to deduplication logic
+            "description": "Should process if no final indicator (falls back to deduplication)",
+        },
+    ]
+
+    def test_correct_isfinal_attribute_detection(self):
+        """Test that we correctly detect the is_final attribute in Google Speech v2 Python gRPC responses."""
+        for scenario in self.SCENARIOS:
             with self.subTest(scenario=scenario["name"]):
                 response = MockResponse([scenario["result"]])
                 should_process = should_process_response_v2(response)
@@ -159,20 +197,6 @@ class TestCorrectedIsFinalFix(unittest.TestCase):
             },
         ]
 
-        def process_with_corrected_fix(stream):
-            """Process stream with the corrected is_final fix."""
-            processed = []
-
-            for item in stream:
-                transcript = item["transcript"]
-                is_final = item["is_final"]
-                confidence = item["confidence"]
-
-                if is_final and confidence > 0.5 and transcript.strip():
-                    processed.append(transcript)
-
-            return processed
-
         processed = process_with_corrected_fix(user_stream)
 
         print("\nCorrected is_final fix test:")
@@ -194,41 +218,10 @@ class TestCorrectedIsFinalFix(unittest.TestCase):
 
     def test_attribute_priority_order(self):
         """Test that is_final takes priority over isFinal when both are present."""
-
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, is_final=False, isFinal=False):
-                self.alternatives = alternatives
-                self.is_final = is_final  # Python gRPC style
-                self.isFinal = isFinal  # REST API style
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
         # Create a result with both attributes set to different values
         result = MockResult([MockAlternative("Test transcript", 0.9)], is_final=True, isFinal=False)
         response = MockResponse([result])
 
-        def get_is_final_value(response):
-            """Extract is_final value using the same logic as our implementation."""
-            if not response.results:
-                return False
-
-            result = response.results[0]
-
-            # Google Speech v2 Python gRPC API uses is_final (snake_case)
-            if hasattr(result, "is_final"):
-                return result.is_final
-            elif hasattr(result, "isFinal"):  # Fallback for REST API style
-                return result.isFinal
-
-            return False
-
         is_final_value = get_is_final_value(response)
 
         # Should prioritize is_final (snake_case) over isFinal (camelCase)
@@ -3,113 +3,132 @@ Unit tests for the deduplication logic without importing the full module.
 Tests the core logic that was implemented to fix transcription duplication.
 """
 
+import logging
+import sys
 import unittest
+from collections import namedtuple
+
+
+# Mock response structure for Google Speech v2
+class MockAlternative(namedtuple("MockAlternative", "transcript confidence")):
+    __slots__ = ()
+
+    def __new__(cls, transcript, confidence):
+        # Strip once at construction so the stream loops never have to, and
+        # intern so repeated transcripts compare by identity in set lookups
+        return super().__new__(cls, sys.intern(transcript.strip()), confidence)
+
+
+MockResult = namedtuple("MockResult", "alternatives is_final", defaults=(False,))
+MockResponse = namedtuple("MockResponse", "results")
+
+logger = logging.getLogger(__name__)
+
+# Minimum confidence for a final result to be processed
+FINAL_THRESHOLD: float = 0.5
+
+# Transcripts test_confidence_and_final_check expects the new logic to admit
+EXPECTED_PROCESSED = frozenset({"I really need to use the", "I really need to use the restroom"})
+
+# What the user said in test_user_scenario_fix
+USER_ACTUAL_SPEECH = "I really need to use the restroom. I hope this will work so I can go."
+
+# The partial results that caused the duplication: "I really" repeated up to five
+# times, then growing towards the full sentence, followed by the correct final result
+PROBLEMATIC_STREAM = (
+    *(
+        sys.intern(", ".join(["I really"] * repeats) + suffix)
+        for repeats, suffix in (
+            (1, ""),
+            (2, ""),
+            (3, ""),
+            (4, ""),
+            (5, " need"),
+            (5, " need to"),
+            (5, " need to use"),
+            (5, " need to use the"),
+            (5, " need to use the rest"),
+            (5, " need to use the restroom"),
+        )
+    ),
+    USER_ACTUAL_SPEECH,
+)
+
+
+def _build_stream(specs):
+    """Build an immutable stream of single-result responses from (transcript, confidence, is_final)."""
+    return tuple(
+        MockResponse([MockResult([MockAlternative(transcript, confidence)], is_final=is_final)])
+        for transcript, confidence, is_final in specs
+    )
 
 
 class TestDeduplicationLogic(unittest.TestCase):
     """Test the deduplication logic implemented in the streaming response processing."""
 
+    @classmethod
+    def setUpClass(cls):
+        # Streams are read-only, so build them once for the whole class
+        cls.TEST_RESPONSES = _build_stream(
+            [
+                # Partial results that were causing duplication
+                ("I really", 0.8, False),
+                ("I really, I really", 0.8, False),
+                ("I really, I really, I really", 0.8, False),
+                ("I really, I really, I really, I really", 0.8, False),
+                # Final result
+                ("I really need to use the restroom", 0.95, True),
+                ("I really need to use the restroom", 0.95, True),
+                ("I really need to use the restroom", 0.95, True),
+            ]
+        )
+        # Same final result repeated multiple times
+        cls.DUPLICATE_RESPONSES = _build_stream([("Hello world", 0.9, True)] * 4)
+
     def test_new_processing_logic(self):
         """Test the new processing logic that handles partial vs final results."""
 
-        # Mock response structure
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, is_final=False):
-                self.alternatives = alternatives
-                self.is_final = is_final
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
-        # Test data simulating the user's issue
-        test_responses = [
-            # Partial results that were causing duplication
-            MockResponse([MockResult([MockAlternative("I really", 0.8)], is_final=False)]),
-            MockResponse(
-                [MockResult([MockAlternative("I really, I really", 0.8)], is_final=False)]
-            ),
-            MockResponse(
-                [MockResult([MockAlternative("I really, I really, I really", 0.8)], is_final=False)]
-            ),
-            MockResponse(
-                [
-                    MockResult(
-                        [MockAlternative("I really, I really, I really, I really", 0.8)],
-                        is_final=False,
-                    )
-                ]
-            ),
-            # Final result
-            MockResponse(
-                [
-                    MockResult(
-                        [MockAlternative("I really need to use the restroom", 0.95)], is_final=True
-                    )
-                ]
-            ),
-            MockResponse(
-                [
-                    MockResult(
-                        [MockAlternative("I really need to use the restroom", 0.95)], is_final=True
-                    )
-                ]
-            ),
-            MockResponse(
-                [
-                    MockResult(
-                        [MockAlternative("I really need to use the restroom", 0.95)], is_final=True
-                    )
-                ]
-            ),
-        ]
-
         # Old problematic logic (processes all results)
         old_processed = []
-        for response in test_responses:
+        for response in self.TEST_RESPONSES:
             if response.results:
                 result = response.results[0]
                 if result.alternatives:
                     alternative = result.alternatives[0]
-                    transcript = alternative.transcript.strip()
+                    transcript = alternative.transcript
                     confidence = alternative.confidence
 
                     # Old logic: only checked confidence and non-empty
-                    if confidence > 0.5 and transcript:
+                    if confidence > FINAL_THRESHOLD and transcript:
                         old_processed.append(transcript)
 
         # New fixed logic (only processes final, unique results)
         new_processed = []
         seen_transcripts = set()
 
-        for response in test_responses:
+        for response in self.TEST_RESPONSES:
             if response.results:
                 result = response.results[0]
                 if result.alternatives:
                     alternative = result.alternatives[0]
-                    transcript = alternative.transcript.strip()
+                    transcript = alternative.transcript
                     confidence = alternative.confidence
 
                     # New logic: check is_final, confidence, and duplicates
-                    is_final_result = hasattr(result, "is_final") and result.is_final
+                    is_final_result = result.is_final
 
                     if (
-                        is_final_result
-                        and confidence > 0.5
-                        and transcript
+                        transcript
+                        and is_final_result
+                        and confidence > FINAL_THRESHOLD
                         and transcript not in seen_transcripts
                     ):
                         seen_transcripts.add(transcript)
                         new_processed.append(transcript)
 
         # Verify the fix
-        print(f"Old logic processed: {len(old_processed)} transcripts")
-        print(f"New logic processed: {len(new_processed)} transcripts")
+        logger.debug("Old logic processed: %d transcripts", len(old_processed))
+        logger.debug("New logic processed: %d transcripts", len(new_processed))
 
         # Old logic processed everything (causing duplication)
         self.assertGreater(len(old_processed), 1)
@@ -128,20 +147,6 @@ class TestDeduplicationLogic(unittest.TestCase):
     def test_confidence_and_final_check(self):
         """Test the combined confidence and final result checking."""
 
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, is_final=False):
-                self.alternatives = alternatives
-                self.is_final = is_final
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
         # Test cases: (transcript, confidence, is_final, should_process)
         test_cases = [
             ("I really", 0.8, False, False),  # Partial, good confidence -> ignore
@@ -170,22 +175,22 @@ class TestDeduplicationLogic(unittest.TestCase):
                 result = response.results[0]
                 if result.alternatives:
                     alternative = result.alternatives[0]
-                    transcript = alternative.transcript.strip()
+                    transcript = alternative.transcript
                     confidence = alternative.confidence
 
-                    is_final_result = hasattr(result, "is_final") and result.is_final
+                    is_final_result = result.is_final
 
                     if (
-                        is_final_result
-                        and confidence > 0.5
-                        and transcript
+                        transcript
+                        and is_final_result
+                        and confidence > FINAL_THRESHOLD
                         and transcript not in seen_transcripts
                     ):
                         seen_transcripts.add(transcript)
                         processed.append(transcript)
 
-            # Verify expected behavior
-            actual_processed = transcript in processed
+            # Verify expected behavior (seen_transcripts holds exactly the processed set)
+            actual_processed = transcript in seen_transcripts
             self.assertEqual(
                 actual_processed,
                 should_process,
@@ -193,53 +198,29 @@ class TestDeduplicationLogic(unittest.TestCase):
             )
 
         # Verify only the expected transcripts were processed
-        expected_processed = ["I really need to use the", "I really need to use the restroom"]
-        self.assertEqual(len(processed), len(expected_processed))
-        for expected in expected_processed:
-            self.assertIn(expected, processed)
+        self.assertEqual(len(processed), len(EXPECTED_PROCESSED))
+        self.assertFalse(EXPECTED_PROCESSED - seen_transcripts, "missing processed transcripts")
 
     def test_duplicate_elimination(self):
         """Test that duplicate final results are eliminated."""
 
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, is_final=False):
-                self.alternatives = alternatives
-                self.is_final = is_final
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
-        # Same final result repeated multiple times
-        duplicate_responses = [
-            MockResponse([MockResult([MockAlternative("Hello world", 0.9)], is_final=True)]),
-            MockResponse([MockResult([MockAlternative("Hello world", 0.9)], is_final=True)]),
-            MockResponse([MockResult([MockAlternative("Hello world", 0.9)], is_final=True)]),
-            MockResponse([MockResult([MockAlternative("Hello world", 0.9)], is_final=True)]),
-        ]
-
         processed = []
         seen_transcripts = set()
 
-        for response in duplicate_responses:
+        for response in self.DUPLICATE_RESPONSES:
             if response.results:
                 result = response.results[0]
                 if result.alternatives:
                     alternative = result.alternatives[0]
-                    transcript = alternative.transcript.strip()
+                    transcript = alternative.transcript
                     confidence = alternative.confidence
 
-                    is_final_result = hasattr(result, "is_final") and result.is_final
+                    is_final_result = result.is_final
 
                     if (
-                        is_final_result
-                        and confidence > 0.5
-                        and transcript
+                        transcript
+                        and is_final_result
+                        and confidence > FINAL_THRESHOLD
                         and transcript not in seen_transcripts
                     ):
                         seen_transcripts.add(transcript)
@@ -254,26 +235,11 @@ class TestDeduplicationLogic(unittest.TestCase):
         # User said: "I really need to use the restroom. I hope this will work so I can go."
         # But got: "I really, I really, I really, I really, I really need..." (massive duplication)
 
-        user_actual_speech = "I really need to use the restroom. I hope this will work so I can go."
-
-        # Simulate the problematic partial results that were causing duplication
-        problematic_stream = [
-            "I really",
-            "I really, I really",
-            "I really, I really, I really",
-            "I really, I really, I really, I really",
-            "I really, I really, I really, I really, I really need",
-            "I really, I really, I really, I really, I really need to",
-            "I really, I really, I really, I really, I really need to use",
-            "I really, I really, I really, I really, I really need to use the",
-            "I really, I really, I really, I really, I really need to use the rest",
-            "I really, I really, I really, I really, I really need to use the restroom",
-            # Final correct result
-            user_actual_speech,
-        ]
+        user_actual_speech = USER_ACTUAL_SPEECH
+        problematic_stream = PROBLEMATIC_STREAM
 
         # Old logic would process all of these (causing the duplication issue)
-        old_processed = problematic_stream.copy()  # All would be processed
+        old_processed = list(problematic_stream)  # All would be processed
 
         # New logic should only process the final, correct result
         new_processed = []
@@ -284,14 +250,21 @@ class TestDeduplicationLogic(unittest.TestCase):
             is_final = i == len(problematic_stream) - 1  # Only last one is final
             confidence = 0.9  # Assume good confidence
 
-            if is_final and confidence > 0.5 and transcript and transcript not in seen_transcripts:
+            if (
+                transcript
+                and is_final
+                and confidence > FINAL_THRESHOLD
+                and transcript not in seen_transcripts
+            ):
                 seen_transcripts.add(transcript)
                 new_processed.append(transcript)
 
         # Verify the fix
-        print("\nUser scenario test:")
-        print(f"Old logic would process: {len(old_processed)} transcripts")
-        print(f"New logic processes: {len(new_processed)} transcripts")
+        logger.debug(
+            "User scenario: old logic would process %d transcripts, new logic processes %d",
+            len(old_processed),
+            len(new_processed),
+        )
 
         # Old logic had massive duplication
         self.assertGreater(len(old_processed), 5)
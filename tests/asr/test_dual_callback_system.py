@@ -3,193 +3,155 @@ Test the dual callback system for interim and final results.
 Tests that interim results go to the UI and final results go to the LLM.
 """
 
+import logging
+import sys
 import unittest
+from collections import namedtuple
+from unittest.mock import patch
+
+from tests.asr._duplication_cases import ConfirmedTranscriptBloom, TranscriptBloom
+
+
+# Mock response structure for Google Speech v2
+class MockAlternative(namedtuple("MockAlternative", "transcript confidence")):
+    __slots__ = ()
+
+    def __new__(cls, transcript, confidence):
+        # Strip once at construction so the stream loops never have to, and
+        # intern so repeated transcripts compare by identity in set lookups
+        return super().__new__(cls, sys.intern(transcript.strip()), confidence)
+
+
+MockResult = namedtuple("MockResult", "alternatives is_final", defaults=(False,))
+MockResponse = namedtuple("MockResponse", "results")
+
+logger = logging.getLogger(__name__)
+
+# Minimum confidence for interim (UI) and final (LLM) results
+INTERIM_THRESHOLD: float = 0.3
+FINAL_THRESHOLD: float = 0.5
+
+
+def _process_stream(
+    stream, interim_cb, final_cb, *, interim_thr=INTERIM_THRESHOLD, final_thr=FINAL_THRESHOLD
+):
+    """Route interim results to interim_cb and unique finals to final_cb."""
+    seen_transcripts = ConfirmedTranscriptBloom()
+    contains_or_add = seen_transcripts.contains_or_add
+
+    # Drop responses without a result or alternative before the routing loop,
+    # indexing each response's first result only once
+    results = (response.results[0] for response in stream if response.results)
+    valid = ((result.alternatives[0], result.is_final) for result in results if result.alternatives)
+
+    for alternative, is_final in valid:
+        transcript = alternative.transcript
+        confidence = alternative.confidence
+
+        # Interim results feed the real-time display
+        if not is_final and interim_cb and confidence > interim_thr:
+            interim_cb(transcript)
+
+        # Final results feed LLM processing, once per transcript; cheapest checks first
+        if transcript and is_final and confidence > final_thr and not contains_or_add(transcript):
+            if final_cb:
+                final_cb(transcript)
+
+
+def _build_stream(specs):
+    """Build an immutable stream of single-result responses from (transcript, confidence, is_final)."""
+    return tuple(
+        MockResponse([MockResult([MockAlternative(transcript, confidence)], is_final=is_final)])
+        for transcript, confidence, is_final in specs
+    )
 
 
 class TestDualCallbackSystem(unittest.TestCase):
     """Test the dual callback system for real-time streaming."""
 
+    @classmethod
+    def setUpClass(cls):
+        # Streams are read-only, so build them once for the whole class
+        cls.STREAMING_RESPONSES = _build_stream(
+            [
+                # Interim results (should go to interim_callback)
+                ("I,", 0.4, False),
+                ("I like,", 0.5, False),
+                ("I like to", 0.6, False),
+                ("I like to drink", 0.7, False),
+                ("I like to drink a", 0.8, False),
+                # Final result (should go to transcription_callback)
+                ("I like to drink a glass of wine.", 0.95, True),
+            ]
+        )
+        cls.THRESHOLD_RESPONSES = _build_stream(
+            [
+                ("Low confidence", 0.2, False),  # Low confidence interim (should be ignored)
+                ("Good confidence", 0.6, False),  # Good confidence interim (should be processed)
+                ("Low final", 0.3, True),  # Low confidence final (should be ignored)
+                ("Good final", 0.8, True),  # Good confidence final (should be processed)
+            ]
+        )
+        cls.CONVERSATION_STREAM = _build_stream(
+            [
+                # First utterance
+                ("Hello", 0.4, False),
+                ("Hello there", 0.5, False),
+                ("Hello there,", 0.6, False),
+                ("Hello there, how are you?", 0.8, False),
+                ("Hello there, how are you today?", 0.95, True),
+                # Second utterance
+                ("I'm", 0.35, False),  # Above 0.3 threshold
+                ("I'm doing", 0.5, False),
+                ("I'm doing well", 0.7, False),
+                ("I'm doing well thanks", 0.9, False),
+                ("I'm doing well thanks for asking", 0.98, True),
+            ]
+        )
+
     def test_interim_and_final_callback_routing(self):
         """Test that interim results go to interim_callback and final results go to transcription_callback."""
 
-        # Mock response structure for Google Speech v2
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, is_final=False):
-                self.alternatives = alternatives
-                self.is_final = is_final
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
-        # Simulate streaming responses with interim and final results
-        streaming_responses = [
-            # Interim results (should go to interim_callback)
-            MockResponse([MockResult([MockAlternative("I,", 0.4)], is_final=False)]),
-            MockResponse([MockResult([MockAlternative("I like,", 0.5)], is_final=False)]),
-            MockResponse([MockResult([MockAlternative("I like to", 0.6)], is_final=False)]),
-            MockResponse([MockResult([MockAlternative("I like to drink", 0.7)], is_final=False)]),
-            MockResponse([MockResult([MockAlternative("I like to drink a", 0.8)], is_final=False)]),
-            # Final result (should go to transcription_callback)
-            MockResponse(
-                [
-                    MockResult(
-                        [MockAlternative("I like to drink a glass of wine.", 0.95)], is_final=True
-                    )
-                ]
-            ),
-        ]
-
         # Track which callbacks receive which transcripts
         interim_received = []
         final_received = []
 
-        def interim_callback(transcript):
-            interim_received.append(transcript)
-
-        def final_callback(transcript):
-            final_received.append(transcript)
-
-        def process_dual_callback_stream(stream, interim_cb, final_cb):
-            """Process stream with dual callback logic."""
-            seen_transcripts = set()
-
-            for response in stream:
-                if not response.results:
-                    continue
-
-                result = response.results[0]
-                if not result.alternatives:
-                    continue
-
-                alternative = result.alternatives[0]
-                transcript = alternative.transcript.strip()
-                confidence = getattr(alternative, "confidence", 0.0)
-                is_final = getattr(result, "is_final", False)
-
-                # Handle interim results for real-time display
-                if not is_final and interim_cb and confidence > 0.3:
-                    interim_cb(transcript)
-
-                # Handle final results for LLM processing
-                if (
-                    is_final
-                    and confidence > 0.5
-                    and transcript
-                    and transcript not in seen_transcripts
-                ):
-                    seen_transcripts.add(transcript)
-                    if final_cb:
-                        final_cb(transcript)
-
-        # Process the stream
-        process_dual_callback_stream(streaming_responses, interim_callback, final_callback)
-
-        print("\nDual callback system test:")
-        print(f"Interim transcripts received: {len(interim_received)}")
-        for i, t in enumerate(interim_received):
-            print(f"  Interim {i + 1}: {t}")
-
-        print(f"Final transcripts received: {len(final_received)}")
-        for i, t in enumerate(final_received):
-            print(f"  Final {i + 1}: {t}")
-
-        # Verify interim results routing
+        # Process the stream, collecting straight into the lists
+        _process_stream(self.STREAMING_RESPONSES, interim_received.append, final_received.append)
+
+        logger.debug("Interim transcripts received: %s", interim_received)
+        logger.debug("Final transcripts received: %s", final_received)
+
+        # Verify interim results routing (lengths checked on the lists, membership on snapshots)
         self.assertEqual(len(interim_received), 5)
-        self.assertIn("I,", interim_received)
-        self.assertIn("I like,", interim_received)
-        self.assertIn("I like to", interim_received)
-        self.assertIn("I like to drink", interim_received)
-        self.assertIn("I like to drink a", interim_received)
+        interim_set = frozenset(interim_received)
+        expected_interim = {"I,", "I like,", "I like to", "I like to drink", "I like to drink a"}
+        self.assertFalse(expected_interim - interim_set, "missing interim transcripts")
 
         # Verify final result routing
         self.assertEqual(len(final_received), 1)
         self.assertIn("I like to drink a glass of wine.", final_received)
 
         # Verify no crossover
-        self.assertNotIn("I like to drink a glass of wine.", interim_received)
+        self.assertNotIn("I like to drink a glass of wine.", interim_set)
         self.assertNotIn("I,", final_received)
 
     def test_confidence_thresholds(self):
         """Test that confidence thresholds work correctly for both callbacks."""
 
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, is_final=False):
-                self.alternatives = alternatives
-                self.is_final = is_final
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
-        # Test various confidence levels
-        test_responses = [
-            # Low confidence interim (should be ignored)
-            MockResponse([MockResult([MockAlternative("Low confidence", 0.2)], is_final=False)]),
-            # Good confidence interim (should be processed)
-            MockResponse([MockResult([MockAlternative("Good confidence", 0.6)], is_final=False)]),
-            # Low confidence final (should be ignored)
-            MockResponse([MockResult([MockAlternative("Low final", 0.3)], is_final=True)]),
-            # Good confidence final (should be processed)
-            MockResponse([MockResult([MockAlternative("Good final", 0.8)], is_final=True)]),
-        ]
-
         interim_received = []
         final_received = []
 
-        def interim_callback(transcript):
-            interim_received.append(transcript)
-
-        def final_callback(transcript):
-            final_received.append(transcript)
-
-        def process_with_thresholds(stream, interim_cb, final_cb):
-            """Process with confidence thresholds."""
-            seen_transcripts = set()
-
-            for response in stream:
-                if not response.results:
-                    continue
+        _process_stream(
+            self.THRESHOLD_RESPONSES,
+            interim_received.append,
+            final_received.append,
+            interim_thr=INTERIM_THRESHOLD,
+            final_thr=FINAL_THRESHOLD,
+        )
 
-                result = response.results[0]
-                if not result.alternatives:
-                    continue
-
-                alternative = result.alternatives[0]
-                transcript = alternative.transcript.strip()
-                confidence = getattr(alternative, "confidence", 0.0)
-                is_final = getattr(result, "is_final", False)
-
-                # Handle interim results (confidence > 0.3)
-                if not is_final and interim_cb and confidence > 0.3:
-                    interim_cb(transcript)
-
-                # Handle final results (confidence > 0.5)
-                if (
-                    is_final
-                    and confidence > 0.5
-                    and transcript
-                    and transcript not in seen_transcripts
-                ):
-                    seen_transcripts.add(transcript)
-                    if final_cb:
-                        final_cb(transcript)
-
-        process_with_thresholds(test_responses, interim_callback, final_callback)
-
-        print("\nConfidence threshold test:")
-        print(f"Interim received: {interim_received}")
-        print(f"Final received: {final_received}")
+        logger.debug("Interim received: %s", interim_received)
+        logger.debug("Final received: %s", final_received)
 
         # Verify confidence filtering
         self.assertEqual(len(interim_received), 1)
@@ -203,54 +165,6 @@ class TestDualCallbackSystem(unittest.TestCase):
     def test_real_time_conversation_scenario(self):
         """Test a realistic real-time conversation scenario."""
 
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, is_final=False):
-                self.alternatives = alternatives
-                self.is_final = is_final
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
-        # Simulate a real conversation with progressive updates
-        conversation_stream = [
-            # First utterance
-            MockResponse([MockResult([MockAlternative("Hello", 0.4)], is_final=False)]),
-            MockResponse([MockResult([MockAlternative("Hello there", 0.5)], is_final=False)]),
-            MockResponse([MockResult([MockAlternative("Hello there,", 0.6)], is_final=False)]),
-            MockResponse(
-                [MockResult([MockAlternative("Hello there, how are you?", 0.8)], is_final=False)]
-            ),
-            MockResponse(
-                [
-                    MockResult(
-                        [MockAlternative("Hello there, how are you today?", 0.95)], is_final=True
-                    )
-                ]
-            ),
-            # Second utterance
-            MockResponse(
-                [MockResult([MockAlternative("I'm", 0.35)], is_final=False)]
-            ),  # Above 0.3 threshold
-            MockResponse([MockResult([MockAlternative("I'm doing", 0.5)], is_final=False)]),
-            MockResponse([MockResult([MockAlternative("I'm doing well", 0.7)], is_final=False)]),
-            MockResponse(
-                [MockResult([MockAlternative("I'm doing well thanks", 0.9)], is_final=False)]
-            ),
-            MockResponse(
-                [
-                    MockResult(
-                        [MockAlternative("I'm doing well thanks for asking", 0.98)], is_final=True
-                    )
-                ]
-            ),
-        ]
-
         ui_updates = []
         llm_inputs = []
 
@@ -262,62 +176,29 @@ class TestDualCallbackSystem(unittest.TestCase):
             """Simulates LLM processing of final results."""
             llm_inputs.append(f"LLM: {transcript}")
 
-        def process_conversation(stream, ui_cb, llm_cb):
-            """Process conversation with dual callbacks."""
-            seen_transcripts = set()
-
-            for response in stream:
-                if not response.results:
-                    continue
-
-                result = response.results[0]
-                if not result.alternatives:
-                    continue
-
-                alternative = result.alternatives[0]
-                transcript = alternative.transcript.strip()
-                confidence = getattr(alternative, "confidence", 0.0)
-                is_final = getattr(result, "is_final", False)
-
-                # UI gets interim updates for real-time feedback
-                if not is_final and ui_cb and confidence > 0.3:
-                    ui_cb(transcript)
-
-                # LLM gets final, complete sentences for processing
-                if (
-                    is_final
-                    and confidence > 0.5
-                    and transcript
-                    and transcript not in seen_transcripts
-                ):
-                    seen_transcripts.add(transcript)
-                    if llm_cb:
-                        llm_cb(transcript)
-
-        process_conversation(conversation_stream, ui_display_callback, llm_processing_callback)
-
-        print("\nReal-time conversation scenario:")
-        print(f"UI updates (interim): {len(ui_updates)}")
-        for update in ui_updates:
-            print(f"  {update}")
+        _process_stream(self.CONVERSATION_STREAM, ui_display_callback, llm_processing_callback)
 
-        print(f"LLM inputs (final): {len(llm_inputs)}")
-        for input_text in llm_inputs:
-            print(f"  {input_text}")
+        logger.debug("UI updates (interim): %s", ui_updates)
+        logger.debug("LLM inputs (final): %s", llm_inputs)
 
         # Verify the conversation flow
         self.assertEqual(len(ui_updates), 8)  # 4 interim + 4 interim
         self.assertEqual(len(llm_inputs), 2)  # 2 final sentences
 
+        # Snapshot once for the membership checks below
+        ui_updates_set = frozenset(ui_updates)
+        llm_inputs_set = frozenset(llm_inputs)
+
         # Verify UI gets progressive updates
-        self.assertIn("UI: Hello", ui_updates)
-        self.assertIn("UI: Hello there", ui_updates)
-        self.assertIn("UI: I'm", ui_updates)
-        self.assertIn("UI: I'm doing well", ui_updates)
+        expected_ui = {"UI: Hello", "UI: Hello there", "UI: I'm", "UI: I'm doing well"}
+        self.assertFalse(expected_ui - ui_updates_set, "missing UI updates")
 
         # Verify LLM gets complete sentences
-        self.assertIn("LLM: Hello there, how are you today?", llm_inputs)
-        self.assertIn("LLM: I'm doing well thanks for asking", llm_inputs)
+        expected_llm = {
+            "LLM: Hello there, how are you today?",
+            "LLM: I'm doing well thanks for asking",
+        }
+        self.assertFalse(expected_llm - llm_inputs_set, "missing LLM inputs")
 
         # Verify no final results in UI
         for update in ui_updates:
@@ -325,18 +206,43 @@ class TestDualCallbackSystem(unittest.TestCase):
             self.assertFalse(update.endswith("asking"))
 
         # Verify no interim results in LLM (check for exact matches, not substrings)
-        interim_texts = [
-            "Hello",
-            "Hello there",
-            "Hello there,",
-            "Hello there, how are you?",
-            "I'm",
-            "I'm doing",
-            "I'm doing well",
-            "I'm doing well thanks",
-        ]
-        for input_text in llm_inputs:
-            self.assertNotIn(input_text.replace("LLM: ", ""), interim_texts)
+        interim_texts = frozenset(
+            {
+                "Hello",
+                "Hello there",
+                "Hello there,",
+                "Hello there, how are you?",
+                "I'm",
+                "I'm doing",
+                "I'm doing well",
+                "I'm doing well thanks",
+            }
+        )
+        llm_texts = {input_text.replace("LLM: ", "") for input_text in llm_inputs}
+        self.assertFalse(llm_texts & interim_texts, "interim transcripts reached the LLM")
+
+    def test_transcript_bloom_rejects_repeated_finals(self):
+        """Test that the Bloom filter dedup store reports repeats and nothing else."""
+        bloom = TranscriptBloom()
+
+        self.assertFalse(bloom.contains_or_add("Hello world"))
+        self.assertTrue(bloom.contains_or_add("Hello world"))
+        self.assertIn("Hello world", bloom)
+        self.assertNotIn("Hello there", bloom)
+
+        bloom.add("Hello there")
+        self.assertIn("Hello there", bloom)
+
+    def test_bloom_false_positive_does_not_drop_new_final(self):
+        """Test that a final the Bloom filter wrongly reports as seen still reaches the LLM once."""
+        finals = []
+        stream = _build_stream([("Hello there", 0.9, True), ("Hello there", 0.9, True)])
+
+        # Make every lookup a Bloom hit, as in a saturated filter; only the LRU can tell
+        with patch.object(TranscriptBloom, "contains_or_add", return_value=True):
+            _process_stream(stream, None, finals.append)
+
+        self.assertEqual(finals, ["Hello there"])
 
 
 if __name__ == "__main__":
@@ -3,8 +3,48 @@ Test the duplication fix logic without importing the full module.
 Tests the core algorithms that prevent massive transcript duplication.
 """
 
+import logging
 import unittest
 
+from tests.asr._duplication_cases import (
+    DUPLICATE_CASES,
+    SIMILAR_TRANSCRIPTS,
+    TranscriptDeduper,
+    classify_finals,
+)
+
+logger = logging.getLogger(__name__)
+
+# (transcript, confidence, is_final) for the threshold filtering test
+CONFIDENCE_CASES = (
+    ("I", 0.2, False),  # Low confidence interim
+    ("I like", 0.4, False),  # Good confidence interim
+    ("I like coffee", 0.6, False),  # High confidence interim
+    ("I like coffee.", 0.8, True),  # High confidence final
+    ("I like coffee very much", 0.9, True),  # Very high confidence final
+)
+
+# The user's problematic scenario: partial results in rapid succession
+PROBLEMATIC_TRANSCRIPTS = (
+    "I,",
+    "Am I am?",
+    "I am, I am one.",
+    "I am wonderful. I am wondering. I am wondering. I am wondering.",
+    "I am wondering what?",
+    "I am wondering why.",
+    "I am wondering why it can.",
+    "I am wondering why it.",
+    "I am wondering why I can take.",
+    "I am wondering why I can take. So",
+    "I am wondering why I can take soul.",
+    "I am wondering why it can take so long.",
+    "I am wondering why it can take so long for.",
+    "I am wondering why I can take so long for.",
+    "I am wondering why I can take so long for this.",
+    "I am wondering why it can take so long for this.",
+    "I am wondering why it can take so long for this app.",
+)
+
 
 class TestDuplicationLogic(unittest.TestCase):
     """Test the core logic for preventing transcript duplication."""
@@ -12,49 +52,44 @@ class TestDuplicationLogic(unittest.TestCase):
     def test_conservative_final_detection(self):
         """Test that final detection is conservative and prevents duplicates."""
         # Simulate the problematic scenario from user logs
-        similar_transcripts = [
-            "I am wondering why it can take so long for this ethic.",
-            "I am wondering why it can take so long for this athlete.",
-            "I am wondering why it can take so long for this application.",
-            "I am wondering why I can take so long for this affiliation.",
-            "I am wondering why I can take so long for this athletic.",
-            "I am wondering why it can take so long for this athlete to start.",
-            "I am wondering why it can take so long for this application to start.",
-        ]
+        similar_transcripts = SIMILAR_TRANSCRIPTS
 
         final_results = []
         last_final_time = -2.0  # Initialize to allow first result
 
-        for i, transcript in enumerate(similar_transcripts):
+        # Simulate conservative fallback logic (no is_final attribute), using a higher
+        # confidence to test the > 0.95 condition
+        finals = classify_finals(similar_transcripts, [0.96] * len(similar_transcripts))
+
+        for i, (transcript, is_final_result) in enumerate(zip(similar_transcripts, finals)):
             current_time = i * 0.5  # Simulate 0.5 second intervals
             time_since_last = current_time - last_final_time
 
-            # Simulate conservative fallback logic (no is_final attribute)
-            confidence = 0.96  # Use higher confidence to test > 0.95 condition
-            very_high_confidence = confidence > 0.95
-            has_complete_sentence = transcript.strip().endswith((".", "!", "?"))
-            is_reasonably_long = len(transcript) > 20
-
-            is_final_result = very_high_confidence and has_complete_sentence and is_reasonably_long
-
             # Apply timing constraint (minimum 2 seconds between finals)
             if is_final_result and time_since_last < 2.0:
                 is_final_result = False
-                print(
-                    f"Transcript {i + 1}: '{transcript}' - suppressed by timing ({time_since_last:.1f}s)"
+                logger.debug(
+                    "Transcript %d: '%s' - suppressed by timing (%.1fs)",
+                    i + 1,
+                    transcript,
+                    time_since_last,
                 )
             else:
-                print(
-                    f"Transcript {i + 1}: '{transcript}' - allowed as final ({time_since_last:.1f}s)"
+                logger.debug(
+                    "Transcript %d: '%s' - allowed as final (%.1fs)",
+                    i + 1,
+                    transcript,
+                    time_since_last,
                 )
                 final_results.append(transcript)
                 last_final_time = current_time
 
-        print("\nConservative final detection test:")
-        print(f"Total transcripts: {len(similar_transcripts)}")
-        print(f"Final results allowed: {len(final_results)}")
-        for result in final_results:
-            print(f"  - {result}")
+        logger.debug(
+            "Final results allowed: %d of %d: %s",
+            len(final_results),
+            len(similar_transcripts),
+            final_results,
+        )
 
         # Should have very few final results due to timing constraint
         self.assertLessEqual(
@@ -63,65 +98,59 @@ class TestDuplicationLogic(unittest.TestCase):
 
     def test_duplicate_prevention(self):
         """Test that duplicate prevention works correctly."""
-        seen_transcripts = set()
-
-        test_cases = [
-            ("I would like to make a cup of coffee", False),  # First occurrence
-            ("I would like to make a cup of coffee", True),  # Exact duplicate
-            ("I would like to make a cup of coffee.", False),  # Minor variation - different enough
-            ("I would like to make a cup of tea", False),  # Different enough
-            ("I like coffee", False),  # Different topic
-            ("I like coffee", True),  # Exact duplicate again
-        ]
+        seen_transcripts = TranscriptDeduper()
 
-        for transcript, should_be_duplicate in test_cases:
-            is_duplicate = False
-
-            # Check against seen transcripts
-            for seen_transcript in seen_transcripts:
-                # Simple similarity check
-                if transcript.lower().strip() == seen_transcript.lower().strip():
-                    is_duplicate = True
-                    break
-                # Check if this is just a minor variation
-                if abs(len(transcript) - len(seen_transcript)) <= 3:
-                    words1 = set(transcript.lower().split())
-                    words2 = set(seen_transcript.lower().split())
-                    if words1 and words2:
-                        similarity = len(words1.intersection(words2)) / len(words1.union(words2))
-                        if similarity > 0.8:
-                            is_duplicate = True
-                            break
-
-            if not is_duplicate:
-                seen_transcripts.add(transcript)
-                print(f"Added: '{transcript}'")
-            else:
-                print(f"Duplicate: '{transcript}'")
+        test_cases = DUPLICATE_CASES
 
-            self.assertEqual(
-                is_duplicate,
-                should_be_duplicate,
-                f"Transcript '{transcript}' duplicate detection mismatch",
-            )
+        for i, (transcript, should_be_duplicate) in enumerate(test_cases):
+            with self.subTest(case=i, transcript=transcript):
+                is_duplicate = seen_transcripts.check_and_add(transcript)
+
+                logger.debug("%s: '%s'", "Duplicate" if is_duplicate else "Added", transcript)
+
+                self.assertEqual(
+                    is_duplicate,
+                    should_be_duplicate,
+                    f"Transcript '{transcript}' duplicate detection mismatch",
+                )
 
-        print("\nDuplicate prevention test:")
-        print(f"Unique transcripts: {len(seen_transcripts)}")
-        for transcript in seen_transcripts:
-            print(f"  - {transcript}")
+        logger.debug("Unique transcripts: %s", list(seen_transcripts))
 
         # Should have 4 unique transcripts (the logic allows the minor variation)
         self.assertEqual(len(seen_transcripts), 4, "Should have exactly 4 unique transcripts")
 
+    def test_duplicate_prevention_evicts_least_recent(self):
+        """Test that the dedup store stays bounded and evicts the least recently seen transcript."""
+        seen_transcripts = TranscriptDeduper(capacity=2)
+
+        self.assertFalse(seen_transcripts.check_and_add("I like coffee"))
+        self.assertFalse(seen_transcripts.check_and_add("I like tea"))
+        self.assertTrue(seen_transcripts.check_and_add("I like coffee"))  # Refreshes coffee
+        self.assertFalse(seen_transcripts.check_and_add("Good morning"))  # Evicts tea
+
+        self.assertEqual(len(seen_transcripts), 2)
+        self.assertEqual(list(seen_transcripts), ["I like coffee", "Good morning"])
+        self.assertFalse(seen_transcripts.check_and_add("I like tea"))
+
+    def test_duplicate_prevention_vocabulary_is_bounded(self):
+        """Test that evicted transcripts give their words back to the shared vocabulary."""
+        seen_transcripts = TranscriptDeduper(capacity=16)
+
+        for i in range(5000):
+            seen_transcripts.check_and_add(f"alpha{i} beta{i} gamma{i}")
+
+        self.assertEqual(len(seen_transcripts), 16)
+        self.assertEqual(len(seen_transcripts._vocab), 48)
+        # Recycled bits keep the masks as narrow as the live vocabulary
+        widest = max(entry[2].bit_length() for entry in seen_transcripts._exact.values())
+        self.assertLessEqual(widest, 48)
+
+        # The most recent transcripts are still recognised after all that eviction
+        self.assertTrue(seen_transcripts.check_and_add("alpha4999 beta4999 gamma4999"))
+
     def test_confidence_threshold_filtering(self):
         """Test confidence threshold filtering for different callback types."""
-        test_transcripts = [
-            ("I", 0.2, False),  # Low confidence interim
-            ("I like", 0.4, False),  # Good confidence interim
-            ("I like coffee", 0.6, False),  # High confidence interim
-            ("I like coffee.", 0.8, True),  # High confidence final
-            ("I like coffee very much", 0.9, True),  # Very high confidence final
-        ]
+        test_transcripts = CONFIDENCE_CASES
 
         interim_results = []
         final_results = []
@@ -133,18 +162,15 @@ class TestDuplicationLogic(unittest.TestCase):
             elif not expected_final and confidence > 0.3:
                 interim_results.append(transcript)
 
-            print(
-                f"Transcript: '{transcript}' (confidence: {confidence:.1f}) -> {'Final' if expected_final else 'Interim'}"
+            logger.debug(
+                "Transcript: '%s' (confidence: %.1f) -> %s",
+                transcript,
+                confidence,
+                "Final" if expected_final else "Interim",
             )
 
-        print("\nConfidence threshold filtering test:")
-        print(f"Interim results: {len(interim_results)}")
-        for result in interim_results:
-            print(f"  - {result}")
-
-        print(f"Final results: {len(final_results)}")
-        for result in final_results:
-            print(f"  - {result}")
+        logger.debug("Interim results: %s", interim_results)
+        logger.debug("Final results: %s", final_results)
 
         # Verify filtering
         self.assertEqual(len(interim_results), 2, "Should have 2 interim results")
@@ -154,29 +180,25 @@ class TestDuplicationLogic(unittest.TestCase):
 
     def test_word_timing_calculation(self):
         """Test word timing calculation for performance metrics."""
-        word_timings = [
-            {"word": "I", "time_from_start": 0.5, "is_interim": True},
-            {"word": "like", "time_from_start": 1.0, "is_interim": True},
-            {"word": "coffee", "time_from_start": 1.5, "is_interim": True},
-            {"word": "very", "time_from_start": 2.5, "is_interim": False},
-            {"word": "much", "time_from_start": 3.0, "is_interim": False},
+        # Parallel (structure-of-arrays) columns rather than one dict per word
+        words = ("I", "like", "coffee", "very", "much")
+        times = (0.5, 1.0, 1.5, 2.5, 3.0)
+        is_interim = (True, True, True, False, False)
+
+        # Calculate average word time (only transitions touching a final result)
+        word_intervals = [
+            later - earlier
+            for earlier, later, earlier_interim, later_interim in zip(
+                times, times[1:], is_interim, is_interim[1:]
+            )
+            if not (earlier_interim and later_interim) and later > earlier
         ]
 
-        # Calculate average word time (only final results)
-        word_intervals = []
-        for i in range(1, len(word_timings)):
-            if not word_timings[i]["is_interim"] or not word_timings[i - 1]["is_interim"]:
-                interval = (
-                    word_timings[i]["time_from_start"] - word_timings[i - 1]["time_from_start"]
-                )
-                if interval > 0:
-                    word_intervals.append(interval)
-
         avg_word_time = sum(word_intervals) / len(word_intervals) if word_intervals else 0
 
-        print("\nWord timing calculation test:")
-        print(f"Word intervals: {word_intervals}")
-        print(f"Average word time: {avg_word_time:.2f}s")
+        logger.debug("Words: %s", words)
+        logger.debug("Word intervals: %s", word_intervals)
+        logger.debug("Average word time: %.2fs", avg_word_time)
 
         # Verify calculation
         self.assertEqual(len(word_intervals), 2, "Should have 2 intervals (transitions)")
@@ -207,8 +229,7 @@ class TestDuplicationLogic(unittest.TestCase):
             f"• Session Duration: {summary['session_duration']:.1f}s"
         )
 
-        print("\nPerformance summary formatting test:")
-        print(display)
+        logger.debug("Performance summary:\n%s", display)
 
         # Verify formatting
         self.assertIn("📊 Performance Metrics:", display)
@@ -223,42 +244,19 @@ class TestDuplicationLogic(unittest.TestCase):
     def test_rapid_transcript_suppression(self):
         """Test suppression of rapid transcript succession."""
         # Simulate the user's problematic scenario
-        problematic_transcripts = [
-            "I,",
-            "Am I am?",
-            "I am, I am one.",
-            "I am wonderful. I am wondering. I am wondering. I am wondering.",
-            "I am wondering what?",
-            "I am wondering why.",
-            "I am wondering why it can.",
-            "I am wondering why it.",
-            "I am wondering why I can take.",
-            "I am wondering why I can take. So",
-            "I am wondering why I can take soul.",
-            "I am wondering why it can take so long.",
-            "I am wondering why it can take so long for.",
-            "I am wondering why I can take so long for.",
-            "I am wondering why I can take so long for this.",
-            "I am wondering why it can take so long for this.",
-            "I am wondering why it can take so long for this app.",
-        ]
+        problematic_transcripts = PROBLEMATIC_TRANSCRIPTS
 
         # Apply conservative filtering
         filtered_results = []
         last_final_time = -2.0
 
-        for i, transcript in enumerate(problematic_transcripts):
+        # Conservative final detection, assuming high (but not > 0.95) confidence
+        finals = classify_finals(problematic_transcripts, [0.9] * len(problematic_transcripts))
+
+        for i, (transcript, is_final_result) in enumerate(zip(problematic_transcripts, finals)):
             current_time = i * 0.3  # Rapid succession (0.3 second intervals)
             time_since_last = current_time - last_final_time
 
-            # Conservative final detection
-            confidence = 0.9  # Assume high confidence
-            very_high_confidence = confidence > 0.95  # False
-            has_complete_sentence = transcript.strip().endswith((".", "!", "?"))
-            is_reasonably_long = len(transcript) > 20
-
-            is_final_result = very_high_confidence and has_complete_sentence and is_reasonably_long
-
             # Apply timing constraint
             if is_final_result and time_since_last < 2.0:
                 is_final_result = False
@@ -270,13 +268,13 @@ class TestDuplicationLogic(unittest.TestCase):
             if is_final_result:
                 filtered_results.append(transcript)
                 last_final_time = current_time
-                print(f"ALLOWED: '{transcript}' (time: {time_since_last:.1f}s)")
+                logger.debug("ALLOWED: '%s' (time: %.1fs)", transcript, time_since_last)
             else:
-                print(f"SUPPRESSED: '{transcript}' (time: {time_since_last:.1f}s)")
+                logger.debug("SUPPRESSED: '%s' (time: %.1fs)", transcript, time_since_last)
 
-        print("\nRapid transcript suppression test:")
-        print(f"Original transcripts: {len(problematic_transcripts)}")
-        print(f"Filtered results: {len(filtered_results)}")
+        logger.debug(
+            "Filtered results: %d of %d", len(filtered_results), len(problematic_transcripts)
+        )
 
         # Should suppress almost all of them
         self.assertLess(len(filtered_results), 3, "Should suppress almost all rapid transcripts")
@@ -1,228 +0,0 @@
-"""
-Simplified unit tests for async callback fix.
-Tests the core async/sync callback issue without full module dependencies.
-"""
-
-import asyncio
-import unittest
-from unittest.mock import AsyncMock, Mock
-
-
-class TestAsyncCallbackFix(unittest.TestCase):
-    """Test cases for async transcription callback handling."""
-
-    def test_sync_callback_works(self):
-        """Test that synchronous callbacks work correctly."""
-        # Create a mock sync callback
-        sync_callback = Mock()
-
-        # Simulate calling the callback synchronously (should work)
-        test_transcript = "Hello world"
-        sync_callback(test_transcript)
-
-        # Verify the callback was called
-        sync_callback.assert_called_once_with(test_transcript)
-
-    def test_async_callback_direct_call_fails(self):
-        """Test that calling async callback directly causes RuntimeWarning."""
-        # Create an async callback
-        async_callback = AsyncMock()
-
-        # Try to call it synchronously (this should cause the issue)
-        test_transcript = "Hello world"
-
-        # This should NOT raise an error but create a coroutine that's never awaited
-        # The RuntimeWarning happens when the coroutine is garbage collected
-        import warnings
-
-        with warnings.catch_warnings(record=True) as w:
-            warnings.simplefilter("always", RuntimeWarning)
-            result = async_callback(test_transcript)
-
-            # The result should be a coroutine
-            import inspect
-
-            self.assertTrue(inspect.iscoroutine(result))
-
-            # Check if RuntimeWarning was generated
-            [warning for warning in w if issubclass(warning.category, RuntimeWarning)]
-            # Note: The warning might not appear immediately, but the coroutine creation is the issue
-
-    def test_async_callback_with_await_works(self):
-        """Test that properly awaiting async callback works."""
-
-        async def test_async_await():
-            # Create an async callback
-            async_callback = AsyncMock()
-
-            # Call it with await (should work)
-            test_transcript = "Hello world"
-            await async_callback(test_transcript)
-
-            # Verify the callback was called
-            async_callback.assert_called_once_with(test_transcript)
-
-        # Run the async test
-        asyncio.run(test_async_await())
-
-    def test_async_callback_with_create_task_works(self):
-        """Test that using asyncio.create_task works for async callbacks."""
-
-        async def test_create_task():
-            # Create an async callback
-            async_callback = AsyncMock()
-
-            # Use create_task to schedule the async callback
-            test_transcript = "Hello world"
-            task = asyncio.create_task(async_callback(test_transcript))
-
-            # Wait for the task to complete
-            await task
-
-            # Verify the callback was called
-            async_callback.assert_called_once_with(test_transcript)
-
-        # Run the async test
-        asyncio.run(test_create_task())
-
-    def test_proposed_fix_wrapper_function(self):
-        """Test the proposed fix: wrapping async callback in sync wrapper."""
-        # Create an async callback
-        async_callback = AsyncMock()
-
-        # Create a sync wrapper that handles the async callback properly
-        def sync_wrapper(transcript: str):
-            """Sync wrapper for async callback."""
-            try:
-                # Get the current event loop
-                asyncio.get_event_loop()
-                # Schedule the async callback
-                asyncio.create_task(async_callback(transcript))
-            except RuntimeError as e:
-                print(f"Error creating task: {e}")
-
-        # Test the wrapper
-        test_transcript = "Hello world"
-
-        async def test_wrapper():
-            sync_wrapper(test_transcript)
-            # Give the task time to execute
-            await asyncio.sleep(0.1)
-            async_callback.assert_called_once_with(test_transcript)
-
-        # Run the test
-        asyncio.run(test_wrapper())
-
-    def test_current_issue_simulation(self):
-        """Test that simulates the current RuntimeWarning issue."""
-
-        # Simulate the current problematic pattern
-        async def mock_handle_transcript(transcript: str):
-            """Mock async _handle_transcript method."""
-            await asyncio.sleep(0.01)  # Simulate async work
-            print(f"Processed transcript: {transcript}")
-
-        # This is what currently happens (problematic)
-        def problematic_callback(transcript: str):
-            """This is how the callback is currently called - causes RuntimeWarning."""
-            return mock_handle_transcript(transcript)  # Called without await!
-
-        # Test that this creates a coroutine object that's never awaited
-        result = problematic_callback("test transcript")
-
-        # The result should be a coroutine (this is the problem)
-        import inspect
-
-        self.assertTrue(inspect.iscoroutine(result))
-
-        # This coroutine would be garbage collected without being awaited
-        # causing the RuntimeWarning we see in the logs
-
-    def test_fix_simulation(self):
-        """Test the proposed fix for the async callback issue."""
-        # Mock async _handle_transcript
-        async_callback = AsyncMock()
-
-        # Fixed callback wrapper
-        def fixed_transcription_callback(transcript: str):
-            """Fixed callback that properly handles async callback."""
-            try:
-                # Get current event loop and create task
-                asyncio.get_event_loop()
-                task = asyncio.create_task(async_callback(transcript))
-                return task
-            except Exception as e:
-                print(f"Error in fixed callback: {e}")
-
-        # Test the fix
-        async def test_fix():
-            test_transcript = "Hello world"
-
-            # Call the fixed callback
-            task = fixed_transcription_callback(test_transcript)
-
-            # Wait for the async work to complete
-            if task and hasattr(task, "__await__"):
-                await task
-
-            # Verify the async callback was called
-            async_callback.assert_called_once_with(test_transcript)
-
-        # Run the test
-        asyncio.run(test_fix())
-
-
-class TestIntegrationScenario(unittest.TestCase):
-    """Integration test scenarios for the callback fix."""
-
-    def test_websocket_callback_scenario(self):
-        """Test the complete WebSocket callback scenario."""
-
-        async def test_websocket_scenario():
-            # Mock websocket
-            mock_websocket = AsyncMock()
-
-            # Mock async _handle_transcript (like in AudioSession)
-            async def mock_handle_transcript(transcript: str):
-                """Mock AudioSession._handle_transcript."""
-                # Filter and send to websocket
-                if "test" in transcript.lower():
-                    await mock_websocket.send_json({"type": "final_transcript", "text": transcript})
-
-            # Create the problematic callback (current implementation)
-            def problematic_callback(transcript: str):
-                """Current problematic implementation."""
-                return mock_handle_transcript(transcript)  # Not awaited!
-
-            # Create the fixed callback
-            def fixed_callback(transcript: str):
-                """Fixed implementation."""
-                try:
-                    asyncio.create_task(mock_handle_transcript(transcript))
-                except Exception as e:
-                    print(f"Error in fixed callback: {e}")
-
-            # Test problematic approach
-            result = problematic_callback("test transcript")
-            # This creates a coroutine that's never awaited
-            import inspect
-
-            self.assertTrue(inspect.iscoroutine(result))
-
-            # Test fixed approach
-            fixed_callback("test transcript 2")
-
-            # Give the async task time to execute
-            await asyncio.sleep(0.1)
-
-            # Verify websocket was called in fixed version
-            mock_websocket.send_json.assert_called()
-            call_args = mock_websocket.send_json.call_args[0][0]
-            self.assertEqual(call_args["text"], "test transcript 2")
-
-        # Run the integration test
-        asyncio.run(test_websocket_scenario())
-
-
-if __name__ == "__main__":
-    unittest.main()
@@ -3,340 +3,204 @@ Unit tests to verify the Google Speech v2 deduplication fix works correctly.
 Tests the actual implementation changes made to the streaming response processing.
 """
 
-import sys
 import unittest
-from unittest.mock import Mock
-
-# Mock the imports that cause issues
-sys.modules["google.cloud.speech_v2"] = Mock()
-sys.modules["google.cloud.speech_v2.types"] = Mock()
-sys.modules["google.cloud.speech_v2.types.cloud_speech"] = Mock()
-
-from src.asr.google_speech_v2 import GoogleSpeechV2Provider  # noqa: E402
+from dataclasses import dataclass
+
+# google.cloud.speech_v2 is stubbed in tests/asr/conftest.py
+from src.asr.google_speech_v2 import GoogleSpeechV2Provider
+
+from tests.asr._duplication_cases import ConfirmedTranscriptBloom
+
+
+@dataclass(slots=True, frozen=True)
+class MockAlternative:
+    transcript: str
+    confidence: float
+
+
+@dataclass(slots=True, frozen=True)
+class MockResult:
+    alternatives: tuple
+    is_final: bool = False
+
+
+@dataclass(slots=True, frozen=True)
+class MockResponse:
+    results: tuple
+
+
+def _response(transcript, confidence, is_final=False):
+    """A streaming response carrying a single result with a single alternative."""
+    return MockResponse((MockResult((MockAlternative(transcript, confidence),), is_final),))
+
+
+# Bloom filter size for one test stream: 4096 bits keep false positives rare for a
+# few hundred finals, where the 1 Mbit default is sized for a whole session
+_STREAM_BLOOM_BITS = 1 << 12
+
+# Partial results followed by a final result and its duplicate
+STREAMING_RESPONSES = (
+    _response("I really", 0.8),
+    _response("I really need", 0.8),
+    _response("I really need to use", 0.8),
+    _response("I really need to use the restroom", 0.95, is_final=True),
+    _response("I really need to use the restroom", 0.95, is_final=True),  # Duplicate
+)
+
+# Only partial results
+PARTIAL_RESPONSES = (
+    _response("Hello", 0.8),
+    _response("Hello world", 0.8),
+    _response("Hello world this", 0.8),
+)
+
+# Final result with low confidence
+LOW_CONFIDENCE_RESPONSES = (_response("mumbled text", 0.3, is_final=True),)
+
+# Duplicate final results
+DUPLICATE_RESPONSES = (
+    _response("Test message", 0.9, is_final=True),
+    _response("Test message", 0.9, is_final=True),
+    _response("Test message", 0.9, is_final=True),
+)
+
+# Partial, final, duplicate and low-confidence results mixed together
+MIXED_RESPONSES = (
+    # Partial results
+    _response("Weather", 0.7),
+    _response("Weather today", 0.7),
+    # Final result
+    _response("Weather today is sunny", 0.9, is_final=True),
+    # Duplicate final
+    _response("Weather today is sunny", 0.9, is_final=True),
+    # Low confidence final
+    _response("Weather today is sunny and warm", 0.3, is_final=True),
+    # New final result
+    _response("Thank you for listening", 0.8, is_final=True),
+)
+
+
+def _make_filter(seen=None, threshold=0.5):
+    """Build the per-response check: the transcript to emit, or None to drop the response.
+
+    The dedup store and threshold are bound once, so the check a streaming loop
+    runs per response only touches locals.
+    """
+    if seen is None:
+        seen = ConfirmedTranscriptBloom(size_bits=_STREAM_BLOOM_BITS)
+    contains_or_add = seen.contains_or_add
+
+    def admit(response):
+        results = response.results
+        if not results:
+            return None
+        result = results[0]
+        alternatives = result.alternatives
+        if not alternatives or not getattr(result, "is_final", False):
+            return None
+        alternative = alternatives[0]
+        if alternative.confidence <= threshold:
+            return None
+        transcript = alternative.transcript
+        # Google rarely pads transcripts; only pay for a new string when it does
+        if transcript[:1].isspace() or transcript[-1:].isspace():
+            transcript = transcript.strip()
+        if not transcript or contains_or_add(transcript):
+            return None
+        return transcript
+
+    return admit
+
+
+def _stream_unique_finals(responses, seen=None):
+    """Lazily yield unique, confident final transcripts from a response stream, in order.
+
+    Works on a one-shot iterator such as a gRPC response stream; nothing is
+    buffered. Pass the same ``seen`` store to continue deduplicating a stream.
+    """
+    yield from filter(None, map(_make_filter(seen), responses))
 
 
 class TestGoogleSpeechDeduplicationFix(unittest.TestCase):
     """Test the actual deduplication fix in GoogleSpeechV2Provider."""
 
-    def setUp(self):
-        """Set up test fixtures."""
-        self.provider = GoogleSpeechV2Provider()
-
-    def test_streaming_response_processing_logic(self):
-        """Test the new streaming response processing logic."""
+    @classmethod
+    def setUpClass(cls):
+        """Build one provider shared by every test in the class."""
+        cls.provider = GoogleSpeechV2Provider()
 
-        # Mock response objects
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, is_final=False):
-                self.alternatives = alternatives
-                self.is_final = is_final
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
-        # Test data - partial and final results
-        test_responses = [
-            MockResponse([MockResult([MockAlternative("I really", 0.8)], is_final=False)]),
-            MockResponse([MockResult([MockAlternative("I really need", 0.8)], is_final=False)]),
-            MockResponse(
-                [MockResult([MockAlternative("I really need to use", 0.8)], is_final=False)]
-            ),
-            MockResponse(
-                [
-                    MockResult(
-                        [MockAlternative("I really need to use the restroom", 0.95)], is_final=True
-                    )
-                ]
-            ),
-            MockResponse(
-                [
-                    MockResult(
-                        [MockAlternative("I really need to use the restroom", 0.95)], is_final=True
-                    )
-                ]
-            ),  # Duplicate
-        ]
+    def setUp(self):
+        """Reset the per-test state of the shared provider."""
+        self.provider.transcription_callback = None
 
+    def assertProcessed(self, responses, expected):
+        """Stream responses through the new logic and check which transcripts reach the callback."""
         # Track processed transcripts
         processed_transcripts = []
+        self.provider.transcription_callback = processed_transcripts.append
+
+        # Apply the new logic
+        for transcript in _stream_unique_finals(iter(responses)):
+            self.provider.transcription_callback(transcript)
 
-        def mock_callback(transcript):
-            processed_transcripts.append(transcript)
-
-        self.provider.transcription_callback = mock_callback
-
-        # Simulate the new processing logic
-        seen_transcripts = set()
-        for response in test_responses:
-            if response.results:
-                result = response.results[0]
-                if result.alternatives:
-                    alternative = result.alternatives[0]
-                    transcript = alternative.transcript.strip()
-                    confidence = alternative.confidence
-
-                    # Apply the new logic
-                    is_final_result = hasattr(result, "is_final") and result.is_final
-
-                    if (
-                        is_final_result
-                        and confidence > 0.5
-                        and transcript
-                        and transcript not in seen_transcripts
-                    ):
-                        seen_transcripts.add(transcript)
-                        mock_callback(transcript)
+        self.assertCountEqual(processed_transcripts, expected)
 
+    def test_streaming_response_processing_logic(self):
+        """Test the new streaming response processing logic."""
         # Verify only one final transcript was processed
-        self.assertEqual(len(processed_transcripts), 1)
-        self.assertEqual(processed_transcripts[0], "I really need to use the restroom")
+        self.assertProcessed(STREAMING_RESPONSES, ["I really need to use the restroom"])
 
     def test_partial_results_ignored(self):
         """Test that partial results are properly ignored."""
-
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, is_final=False):
-                self.alternatives = alternatives
-                self.is_final = is_final
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
-        # Only partial results
-        partial_responses = [
-            MockResponse([MockResult([MockAlternative("Hello", 0.8)], is_final=False)]),
-            MockResponse([MockResult([MockAlternative("Hello world", 0.8)], is_final=False)]),
-            MockResponse([MockResult([MockAlternative("Hello world this", 0.8)], is_final=False)]),
-        ]
-
-        processed_transcripts = []
-
-        def mock_callback(transcript):
-            processed_transcripts.append(transcript)
-
-        self.provider.transcription_callback = mock_callback
-
-        # Apply new logic
-        seen_transcripts = set()
-        for response in partial_responses:
-            if response.results:
-                result = response.results[0]
-                if result.alternatives:
-                    alternative = result.alternatives[0]
-                    transcript = alternative.transcript.strip()
-                    confidence = alternative.confidence
-
-                    is_final_result = hasattr(result, "is_final") and result.is_final
-
-                    if (
-                        is_final_result
-                        and confidence > 0.5
-                        and transcript
-                        and transcript not in seen_transcripts
-                    ):
-                        seen_transcripts.add(transcript)
-                        mock_callback(transcript)
-
         # No transcripts should be processed (all are partial)
-        self.assertEqual(len(processed_transcripts), 0)
+        self.assertProcessed(PARTIAL_RESPONSES, [])
 
     def test_low_confidence_results_ignored(self):
         """Test that low confidence results are ignored even if final."""
-
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, is_final=False):
-                self.alternatives = alternatives
-                self.is_final = is_final
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
-        # Final result with low confidence
-        low_conf_response = MockResponse(
-            [MockResult([MockAlternative("mumbled text", 0.3)], is_final=True)]
-        )
-
-        processed_transcripts = []
-
-        def mock_callback(transcript):
-            processed_transcripts.append(transcript)
-
-        self.provider.transcription_callback = mock_callback
-
-        # Apply new logic
-        seen_transcripts = set()
-        response = low_conf_response
-        if response.results:
-            result = response.results[0]
-            if result.alternatives:
-                alternative = result.alternatives[0]
-                transcript = alternative.transcript.strip()
-                confidence = alternative.confidence
-
-                is_final_result = hasattr(result, "is_final") and result.is_final
-
-                if (
-                    is_final_result
-                    and confidence > 0.5
-                    and transcript
-                    and transcript not in seen_transcripts
-                ):
-                    seen_transcripts.add(transcript)
-                    mock_callback(transcript)
-
         # Low confidence transcript should not be processed
-        self.assertEqual(len(processed_transcripts), 0)
+        self.assertProcessed(LOW_CONFIDENCE_RESPONSES, [])
 
     def test_duplicate_final_results_ignored(self):
         """Test that duplicate final results are ignored."""
-
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, is_final=False):
-                self.alternatives = alternatives
-                self.is_final = is_final
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
-        # Duplicate final results
-        duplicate_responses = [
-            MockResponse([MockResult([MockAlternative("Test message", 0.9)], is_final=True)]),
-            MockResponse([MockResult([MockAlternative("Test message", 0.9)], is_final=True)]),
-            MockResponse([MockResult([MockAlternative("Test message", 0.9)], is_final=True)]),
-        ]
-
-        processed_transcripts = []
-
-        def mock_callback(transcript):
-            processed_transcripts.append(transcript)
-
-        self.provider.transcription_callback = mock_callback
-
-        # Apply new logic
-        seen_transcripts = set()
-        for response in duplicate_responses:
-            if response.results:
-                result = response.results[0]
-                if result.alternatives:
-                    alternative = result.alternatives[0]
-                    transcript = alternative.transcript.strip()
-                    confidence = alternative.confidence
-
-                    is_final_result = hasattr(result, "is_final") and result.is_final
-
-                    if (
-                        is_final_result
-                        and confidence > 0.5
-                        and transcript
-                        and transcript not in seen_transcripts
-                    ):
-                        seen_transcripts.add(transcript)
-                        mock_callback(transcript)
-
         # Only one instance of the duplicate should be processed
-        self.assertEqual(len(processed_transcripts), 1)
-        self.assertEqual(processed_transcripts[0], "Test message")
+        self.assertProcessed(DUPLICATE_RESPONSES, ["Test message"])
 
     def test_mixed_scenarios(self):
         """Test mixed scenarios with partial, final, and duplicate results."""
+        # Should process 2 unique final transcripts with good confidence
+        self.assertProcessed(MIXED_RESPONSES, ["Weather today is sunny", "Thank you for listening"])
+
+    def test_bloom_false_positive_does_not_drop_new_final(self):
+        """Test that a final the Bloom filter wrongly reports as seen is still emitted once."""
+        # Saturate a tiny filter so that every transcript is a Bloom hit
+        seen = ConfirmedTranscriptBloom(size_bits=8, hashes=1)
+        for i in range(64):
+            seen.contains_or_add(f"earlier final {i}")
+        self.assertIn("Test message", seen._bloom)
+
+        self.assertEqual(
+            list(_stream_unique_finals(iter(DUPLICATE_RESPONSES), seen)), ["Test message"]
+        )
 
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, is_final=False):
-                self.alternatives = alternatives
-                self.is_final = is_final
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
-        # Mixed scenario
-        mixed_responses = [
-            # Partial results
-            MockResponse([MockResult([MockAlternative("Weather", 0.7)], is_final=False)]),
-            MockResponse([MockResult([MockAlternative("Weather today", 0.7)], is_final=False)]),
-            # Final result
-            MockResponse(
-                [MockResult([MockAlternative("Weather today is sunny", 0.9)], is_final=True)]
-            ),
-            # Duplicate final
-            MockResponse(
-                [MockResult([MockAlternative("Weather today is sunny", 0.9)], is_final=True)]
-            ),
-            # Low confidence final
-            MockResponse(
-                [
-                    MockResult(
-                        [MockAlternative("Weather today is sunny and warm", 0.3)], is_final=True
-                    )
-                ]
-            ),
-            # New final result
-            MockResponse(
-                [MockResult([MockAlternative("Thank you for listening", 0.8)], is_final=True)]
-            ),
-        ]
-
-        processed_transcripts = []
-
-        def mock_callback(transcript):
-            processed_transcripts.append(transcript)
-
-        self.provider.transcription_callback = mock_callback
-
-        # Apply new logic
-        seen_transcripts = set()
-        for response in mixed_responses:
-            if response.results:
-                result = response.results[0]
-                if result.alternatives:
-                    alternative = result.alternatives[0]
-                    transcript = alternative.transcript.strip()
-                    confidence = alternative.confidence
-
-                    is_final_result = hasattr(result, "is_final") and result.is_final
-
-                    if (
-                        is_final_result
-                        and confidence > 0.5
-                        and transcript
-                        and transcript not in seen_transcripts
-                    ):
-                        seen_transcripts.add(transcript)
-                        mock_callback(transcript)
+    def test_shared_store_deduplicates_across_bursts(self):
+        """Test that passing the same store on continues deduplication into the next burst."""
+        seen = ConfirmedTranscriptBloom(size_bits=_STREAM_BLOOM_BITS)
 
-        # Should process 2 unique final transcripts with good confidence
-        self.assertEqual(len(processed_transcripts), 2)
-        self.assertIn("Weather today is sunny", processed_transcripts)
-        self.assertIn("Thank you for listening", processed_transcripts)
+        self.assertEqual(
+            list(_stream_unique_finals(iter(DUPLICATE_RESPONSES), seen)), ["Test message"]
+        )
+        self.assertEqual(list(_stream_unique_finals(iter(DUPLICATE_RESPONSES), seen)), [])
+
+    def test_confirmation_window_is_bounded(self):
+        """Test that the exact confirmation keeps only the most recent finals."""
+        seen = ConfirmedTranscriptBloom(capacity=2, size_bits=_STREAM_BLOOM_BITS)
+        for transcript in ("one", "two", "three"):
+            self.assertFalse(seen.contains_or_add(transcript))
+
+        self.assertEqual(len(seen), 2)
+        self.assertTrue(seen.contains_or_add("three"))
+        # Evicted, so a repeat this old is let through again
+        self.assertFalse(seen.contains_or_add("one"))
 
 
 if __name__ == "__main__":
@@ -3,7 +3,66 @@ Unit tests to understand Google Speech v2 response structure.
 Tests the is_final attribute and other response properties.
 """
 
+import functools
+import hashlib
+import sys
+import time
 import unittest
+from collections import deque
+from dataclasses import dataclass
+
+# speech_event_type values that mark the end of an utterance
+_END_EVENTS = frozenset({"SPEECH_ACTIVITY_END", "RECOGNITION_COMPLETE"})
+
+# SimHash Hamming distance at or below which a kept transcript is a near-duplicate
+# candidate. SimHash is noisy on a handful of words, so it only picks candidates.
+_SIMHASH_MAX_DISTANCE = 16
+
+# Word-set Jaccard similarity at or above which a candidate is a near-duplicate
+_JACCARD_MIN_SIMILARITY = 0.7
+
+# Number of most recently kept transcripts a new one is compared against
+_DEDUP_WINDOW = 32
+
+
+@dataclass(slots=True, frozen=True)
+class MockAlternative:
+    transcript: str
+    confidence: float
+
+
+@dataclass(slots=True, frozen=True)
+class MockResult:
+    """A streaming result; each possible final indicator is None when the response omits it."""
+
+    alternatives: tuple
+    is_final: bool | None = None
+    result_type: str | None = None
+    speech_event_type: str | None = None
+    timestamp: float | None = None
+
+
+@dataclass(slots=True, frozen=True)
+class MockResponse:
+    results: tuple
+
+
+@functools.lru_cache(maxsize=4096)
+def _word_weights(word: str) -> tuple[int, ...]:
+    """+1/-1 per bit of the word's 64-bit blake2b hash, cached since ASR bursts repeat words."""
+    digest = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "big")
+    return tuple(1 if digest >> bit & 1 else -1 for bit in range(64))
+
+
+def _words(text: str) -> frozenset[str]:
+    """The distinct lowercased words in text."""
+    return frozenset(map(sys.intern, text.lower().split()))
+
+
+def _simhash(words: frozenset[str]) -> int:
+    """64-bit SimHash fingerprint of a set of words."""
+    weights = map(sum, zip(*map(_word_weights, words)))
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
 
 
 class TestGoogleSpeechResponseStructure(unittest.TestCase):
@@ -14,65 +73,66 @@ class TestGoogleSpeechResponseStructure(unittest.TestCase):
         # Based on the logs, we can see that transcripts are still being duplicated
         # This suggests the is_final check is not working as expected
 
-        # Let's examine what the actual response structure might be
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, **kwargs):
-                self.alternatives = alternatives
-                # Add various possible attributes that Google Speech v2 might use
-                for key, value in kwargs.items():
-                    setattr(self, key, value)
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
         # Test different possible final result indicators
         test_scenarios = [
             # Scenario 1: is_final attribute
             {
-                "result": MockResult([MockAlternative("Hello world", 0.9)], is_final=True),
+                "response": MockResponse(
+                    (MockResult((MockAlternative("Hello world", 0.9),), is_final=True),)
+                ),
                 "should_process": True,
                 "description": "Standard is_final=True",
             },
             {
-                "result": MockResult([MockAlternative("Hello", 0.8)], is_final=False),
+                "response": MockResponse(
+                    (MockResult((MockAlternative("Hello", 0.8),), is_final=False),)
+                ),
                 "should_process": False,
                 "description": "Standard is_final=False",
             },
             # Scenario 2: result_type attribute (possible in v2)
             {
-                "result": MockResult([MockAlternative("Hello world", 0.9)], result_type="FINAL"),
+                "response": MockResponse(
+                    (MockResult((MockAlternative("Hello world", 0.9),), result_type="FINAL"),)
+                ),
                 "should_process": True,
                 "description": "result_type=FINAL",
             },
             {
-                "result": MockResult([MockAlternative("Hello", 0.8)], result_type="PARTIAL"),
+                "response": MockResponse(
+                    (MockResult((MockAlternative("Hello", 0.8),), result_type="PARTIAL"),)
+                ),
                 "should_process": False,
                 "description": "result_type=PARTIAL",
             },
             # Scenario 3: speech_event_type attribute
             {
-                "result": MockResult(
-                    [MockAlternative("Hello world", 0.9)], speech_event_type="SPEECH_ACTIVITY_END"
+                "response": MockResponse(
+                    (
+                        MockResult(
+                            (MockAlternative("Hello world", 0.9),),
+                            speech_event_type="SPEECH_ACTIVITY_END",
+                        ),
+                    )
                 ),
                 "should_process": True,
                 "description": "speech_event_type=SPEECH_ACTIVITY_END",
             },
             {
-                "result": MockResult(
-                    [MockAlternative("Hello", 0.8)], speech_event_type="SPEECH_ACTIVITY_START"
+                "response": MockResponse(
+                    (
+                        MockResult(
+                            (MockAlternative("Hello", 0.8),),
+                            speech_event_type="SPEECH_ACTIVITY_START",
+                        ),
+                    )
                 ),
                 "should_process": False,
                 "description": "speech_event_type=SPEECH_ACTIVITY_START",
             },
             # Scenario 4: No final indicator (all results considered final)
             {
-                "result": MockResult([MockAlternative("Hello world", 0.9)]),
+                "response": MockResponse((MockResult((MockAlternative("Hello world", 0.9),)),)),
                 "should_process": True,
                 "description": "No final indicator - treat as final",
             },
@@ -88,26 +148,21 @@ class TestGoogleSpeechResponseStructure(unittest.TestCase):
                 return False
 
             # Check multiple possible final indicators
-            is_final = False
-
             # Standard is_final attribute
-            if hasattr(result, "is_final"):
-                is_final = result.is_final
+            is_final = getattr(result, "is_final", None)
 
-            # result_type attribute
-            elif hasattr(result, "result_type"):
-                is_final = result.result_type.upper() == "FINAL"
+            if is_final is None:
+                # result_type attribute
+                if (result_type := getattr(result, "result_type", None)) is not None:
+                    is_final = result_type.upper() == "FINAL"
 
-            # speech_event_type attribute
-            elif hasattr(result, "speech_event_type"):
-                is_final = result.speech_event_type.upper() in [
-                    "SPEECH_ACTIVITY_END",
-                    "RECOGNITION_COMPLETE",
-                ]
+                # speech_event_type attribute
+                elif (event_type := getattr(result, "speech_event_type", None)) is not None:
+                    is_final = event_type.upper() in _END_EVENTS
 
-            # If no final indicator, assume it's final (v2 might work this way)
-            else:
-                is_final = True
+                # If no final indicator, assume it's final (v2 might work this way)
+                else:
+                    is_final = True
 
             alternative = result.alternatives[0]
             confidence = getattr(alternative, "confidence", 0.0)
@@ -117,52 +172,43 @@ class TestGoogleSpeechResponseStructure(unittest.TestCase):
 
         # Test each scenario
         for scenario in test_scenarios:
-            response = MockResponse([scenario["result"]])
-            should_process = should_process_response_v2(response)
-
             self.assertEqual(
-                should_process, scenario["should_process"], f"Failed for {scenario['description']}"
+                should_process_response_v2(scenario["response"]),
+                scenario["should_process"],
+                f"Failed for {scenario['description']}",
             )
 
     def test_deduplication_with_time_based_approach(self):
         """Test time-based deduplication as an alternative to is_final."""
-        import time
-
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, timestamp=None):
-                self.alternatives = alternatives
-                self.timestamp = timestamp or time.time()
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
         # Simulate rapid partial results followed by final result
         base_time = time.time()
         test_responses = [
-            MockResponse([MockResult([MockAlternative("I really", 0.8)], base_time)]),
-            MockResponse([MockResult([MockAlternative("I really need", 0.8)], base_time + 0.1)]),
+            MockResponse((MockResult((MockAlternative("I really", 0.8),), timestamp=base_time),)),
             MockResponse(
-                [MockResult([MockAlternative("I really need to use", 0.8)], base_time + 0.2)]
+                (MockResult((MockAlternative("I really need", 0.8),), timestamp=base_time + 0.1),)
             ),
             MockResponse(
-                [
+                (
                     MockResult(
-                        [MockAlternative("I really need to use the restroom", 0.9)], base_time + 0.3
-                    )
-                ]
+                        (MockAlternative("I really need to use", 0.8),), timestamp=base_time + 0.2
+                    ),
+                )
             ),
             MockResponse(
-                [
+                (
                     MockResult(
-                        [MockAlternative("I really need to use the restroom", 0.9)], base_time + 0.4
-                    )
-                ]
+                        (MockAlternative("I really need to use the restroom", 0.9),),
+                        timestamp=base_time + 0.3,
+                    ),
+                )
+            ),
+            MockResponse(
+                (
+                    MockResult(
+                        (MockAlternative("I really need to use the restroom", 0.9),),
+                        timestamp=base_time + 0.4,
+                    ),
+                )
             ),
         ]
 
@@ -206,56 +252,42 @@ class TestGoogleSpeechResponseStructure(unittest.TestCase):
     def test_similarity_based_deduplication(self):
         """Test similarity-based deduplication to handle near-duplicates."""
 
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives):
-                self.alternatives = alternatives
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
         # Simulate the user's actual problematic output
         problematic_responses = [
             MockResponse(
-                [
+                (
                     MockResult(
-                        [
+                        (
                             MockAlternative(
                                 "All support, all, support, all support for all support", 0.8
-                            )
-                        ]
-                    )
-                ]
+                            ),
+                        )
+                    ),
+                )
             ),
             MockResponse(
-                [MockResult([MockAlternative("All support for the Google generative", 0.8)])]
+                (MockResult((MockAlternative("All support for the Google generative", 0.8),)),)
             ),
             MockResponse(
-                [MockResult([MockAlternative("All support for the Google generative AI", 0.9)])]
+                (MockResult((MockAlternative("All support for the Google generative AI", 0.9),)),)
             ),
             MockResponse(
-                [MockResult([MockAlternative("Also support for the Google generative", 0.8)])]
+                (MockResult((MockAlternative("Also support for the Google generative", 0.8),)),)
             ),
         ]
 
-        def similarity_based_deduplication(responses, similarity_threshold=0.7):
-            """Deduplicate based on transcript similarity."""
+        def similarity_based_deduplication(
+            responses,
+            max_distance=_SIMHASH_MAX_DISTANCE,
+            min_similarity=_JACCARD_MIN_SIMILARITY,
+            window=_DEDUP_WINDOW,
+        ):
+            """Deduplicate based on similarity to the most recently kept transcripts."""
             processed = []
+            # ASR near-duplicates arrive close together, so only recent transcripts are compared
+            recent = deque(maxlen=window)
 
-            def calculate_similarity(text1, text2):
-                """Simple similarity calculation based on word overlap."""
-                words1 = set(text1.lower().split())
-                words2 = set(text2.lower().split())
-                intersection = words1.intersection(words2)
-                union = words1.union(words2)
-                return len(intersection) / len(union) if union else 0
-
-            for response in problematic_responses:
+            for response in responses:
                 if not response.results:
                     continue
 
@@ -268,16 +300,22 @@ class TestGoogleSpeechResponseStructure(unittest.TestCase):
                 confidence = getattr(alternative, "confidence", 0.0)
 
                 if confidence > 0.5:
-                    # Check if similar to already processed
+                    # Check if similar to already processed: the fingerprint picks
+                    # candidates cheaply, word overlap decides
+                    words = _words(transcript)
+                    fingerprint = _simhash(words)
                     is_similar = False
-                    for processed_transcript in processed:
-                        similarity = calculate_similarity(transcript, processed_transcript)
-                        if similarity >= similarity_threshold:
+                    for recent_hash, recent_words in recent:
+                        if (fingerprint ^ recent_hash).bit_count() > max_distance:
+                            continue
+                        overlap = len(words & recent_words)
+                        if overlap >= min_similarity * len(words | recent_words):
                             is_similar = True
                             break
 
                     if not is_similar:
                         processed.append(transcript)
+                        recent.append((fingerprint, words))
 
             return processed
 
@@ -289,6 +327,73 @@ class TestGoogleSpeechResponseStructure(unittest.TestCase):
         # Should keep unique transcripts
         self.assertTrue(len(processed) >= 1)
 
+        # Short commands that differ by one word are close in SimHash but not duplicates
+        for first, second in (
+            ("turn off the lights", "turn on the lights"),
+            ("set a timer for five minutes", "cancel the timer for five minutes"),
+        ):
+            with self.subTest(first=first, second=second):
+                self.assertEqual(
+                    similarity_based_deduplication(
+                        [
+                            MockResponse((MockResult((MockAlternative(first, 0.9),)),)),
+                            MockResponse((MockResult((MockAlternative(second, 0.9),)),)),
+                        ]
+                    ),
+                    [first, second],
+                )
+
+    def test_speech_activity_end_finalizes_early(self):
+        """Test that end of speech dispatches the best partial before the server's final."""
+        # Partials, then the end-of-speech event, then Google's own final for the same text
+        responses = (
+            MockResponse((MockResult((MockAlternative("What's the", 0.6),), is_final=False),)),
+            MockResponse(
+                (MockResult((MockAlternative("What's the weather", 0.8),), is_final=False),)
+            ),
+            MockResponse((MockResult((), speech_event_type="SPEECH_ACTIVITY_END"),)),
+            MockResponse(
+                (MockResult((MockAlternative("What's the weather", 0.9),), is_final=True),)
+            ),
+        )
+
+        def finalize_on_speech_end(responses, dispatch, threshold=0.5):
+            """Dispatch finals, promoting the best partial as soon as speech ends."""
+            seen_transcripts = set()
+            best_partial = None
+
+            for index, response in enumerate(responses):
+                if not response.results:
+                    continue
+
+                result = response.results[0]
+                if result.alternatives:
+                    alternative = result.alternatives[0]
+                    transcript = alternative.transcript.strip()
+                    if alternative.confidence <= threshold or not transcript:
+                        continue
+
+                    if result.is_final:
+                        best_partial = None
+                        # The early final already covered this utterance
+                        if transcript not in seen_transcripts:
+                            seen_transcripts.add(transcript)
+                            dispatch(index, transcript)
+                    else:
+                        best_partial = transcript
+
+                elif result.speech_event_type == "SPEECH_ACTIVITY_END" and best_partial:
+                    # Finalize now instead of waiting for the server's final result
+                    seen_transcripts.add(best_partial)
+                    dispatch(index, best_partial)
+                    best_partial = None
+
+        dispatched = []
+        finalize_on_speech_end(responses, lambda index, text: dispatched.append((index, text)))
+
+        # Dispatched once, at the speech end event; the server's final is a duplicate
+        self.assertEqual(dispatched, [(2, "What's the weather")])
+
 
 if __name__ == "__main__":
     unittest.main()
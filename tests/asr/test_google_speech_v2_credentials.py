@@ -1,15 +1,18 @@
 import sys
 import types
 
+import pytest
+
 
 class DummySpeechClient:
     def __init__(self, credentials=None):
         self.credentials = credentials
 
 
-def test_initialize_uses_standard_env_when_present(monkeypatch):
-    # Arrange: set env var and stub Google modules
-    monkeypatch.setenv("GOOGLE_APPLICATION_CREDENTIALS", "/tmp/fake.json")
+@pytest.fixture
+def _stub_oauth(monkeypatch):
+    """Stub the Google service account loader and SpeechClient; return what they were given."""
+    captured = {}
 
     # Fake google package hierarchy and service_account module
     google_mod = types.ModuleType("google")
@@ -19,8 +22,7 @@ def test_initialize_uses_standard_env_when_present(monkeypatch):
     class _Creds:
         @classmethod
         def from_service_account_file(cls, path):
-            # Assert the path is what we passed via env
-            assert path == "/tmp/fake.json"
+            captured["path"] = path
             return "CREDS"
 
     sa_mod.Credentials = _Creds
@@ -32,39 +34,39 @@ def test_initialize_uses_standard_env_when_present(monkeypatch):
     # Patch SpeechClient in our module
     import src.asr.google_speech_v2 as gsv2
 
-    captured = {}
-
     class _Client:
         def __init__(self, credentials=None):
             captured["credentials"] = credentials
 
     monkeypatch.setattr(gsv2, "SpeechClient", _Client, raising=True)
+    return captured
+
+
+def test_initialize_uses_standard_env_when_present(monkeypatch, _stub_oauth):
+    # Arrange: set env var
+    monkeypatch.setenv("GOOGLE_APPLICATION_CREDENTIALS", "/tmp/fake.json")
+
+    import src.asr.google_speech_v2 as gsv2
 
     # Act
     provider = gsv2.GoogleSpeechV2Provider()
     provider.initialize(model="latest_long", project_id="proj")
 
-    # Assert: credentials were passed to SpeechClient
-    assert captured.get("credentials") == "CREDS"
+    # Assert: the env path was loaded and its credentials passed to SpeechClient
+    assert _stub_oauth.get("path") == "/tmp/fake.json"
+    assert _stub_oauth.get("credentials") == "CREDS"
 
 
-def test_initialize_falls_back_to_adc_when_env_missing(monkeypatch):
+def test_initialize_falls_back_to_adc_when_env_missing(monkeypatch, _stub_oauth):
     # Ensure env var not set
     monkeypatch.delenv("GOOGLE_APPLICATION_CREDENTIALS", raising=False)
 
     import src.asr.google_speech_v2 as gsv2
 
-    called = {}
-
-    class _Client:
-        def __init__(self, credentials=None):
-            called["credentials"] = credentials
-
-    monkeypatch.setattr(gsv2, "SpeechClient", _Client, raising=True)
-
     # Act
     provider = gsv2.GoogleSpeechV2Provider()
     provider.initialize(model="latest_long", project_id="proj")
 
     # Assert: called without credentials (ADC path)
-    assert called.get("credentials") is None
+    assert "path" not in _stub_oauth
+    assert _stub_oauth.get("credentials") is None
@@ -5,6 +5,72 @@ Tests that we correctly handle the camelCase isFinal field.
 
 import unittest
 
+# Default for getattr probes, distinguishing a missing attribute from a falsy one
+_MISSING = object()
+
+
+# Mock response structure for Google Speech v2
+class MockAlternative:
+    __slots__ = ("transcript", "confidence")
+
+    def __init__(self, transcript, confidence):
+        self.transcript = transcript
+        self.confidence = confidence
+
+
+class MockResult:
+    __slots__ = ("alternatives", "isFinal", "is_final")
+
+    def __init__(self, alternatives, isFinal=_MISSING, is_final=_MISSING):
+        self.alternatives = alternatives
+        # Only set the final indicators a response actually carries
+        if isFinal is not _MISSING:
+            self.isFinal = isFinal
+        if is_final is not _MISSING:
+            self.is_final = is_final
+
+
+class MockResponse:
+    __slots__ = ("results",)
+
+    def __init__(self, results):
+        self.results = results
+
+
+# (name, result, should_process, description) for results with different attribute names
+FINAL_INDICATOR_SCENARIOS = (
+    (
+        "Google Speech v2 with isFinal=True",
+        MockResult([MockAlternative("Hello world", 0.9)], isFinal=True),
+        True,
+        "Should process final result with isFinal=True",
+    ),
+    (
+        "Google Speech v2 with isFinal=False",
+        MockResult([MockAlternative("Hello", 0.8)], isFinal=False),
+        False,
+        "Should ignore interim result with isFinal=False",
+    ),
+    (
+        "Legacy with is_final=True",
+        MockResult([MockAlternative("Hello world", 0.9)], is_final=True),
+        True,
+        "Should process final result with legacy is_final=True",
+    ),
+    (
+        "Legacy with is_final=False",
+        MockResult([MockAlternative("Hello", 0.8)], is_final=False),
+        False,
+        "Should ignore interim result with legacy is_final=False",
+    ),
+    (
+        "No final indicator",
+        MockResult([MockAlternative("Hello world", 0.9)]),
+        True,  # Falls back to deduplication logic
+        "Should process if no final indicator (falls back to deduplication)",
+    ),
+)
+
 
 class TestIsFinalAttributeFix(unittest.TestCase):
     """Test the isFinal attribute fix for Google Speech v2."""
@@ -12,56 +78,6 @@ class TestIsFinalAttributeFix(unittest.TestCase):
     def test_isfinal_attribute_detection(self):
         """Test that we correctly detect the isFinal attribute in Google Speech v2 responses."""
 
-        # Mock response structure for Google Speech v2
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, **kwargs):
-                self.alternatives = alternatives
-                for key, value in kwargs.items():
-                    setattr(self, key, value)
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
-        # Test scenarios with different attribute names
-        test_scenarios = [
-            {
-                "name": "Google Speech v2 with isFinal=True",
-                "result": MockResult([MockAlternative("Hello world", 0.9)], isFinal=True),
-                "should_process": True,
-                "description": "Should process final result with isFinal=True",
-            },
-            {
-                "name": "Google Speech v2 with isFinal=False",
-                "result": MockResult([MockAlternative("Hello", 0.8)], isFinal=False),
-                "should_process": False,
-                "description": "Should ignore interim result with isFinal=False",
-            },
-            {
-                "name": "Legacy with is_final=True",
-                "result": MockResult([MockAlternative("Hello world", 0.9)], is_final=True),
-                "should_process": True,
-                "description": "Should process final result with legacy is_final=True",
-            },
-            {
-                "name": "Legacy with is_final=False",
-                "result": MockResult([MockAlternative("Hello", 0.8)], is_final=False),
-                "should_process": False,
-                "description": "Should ignore interim result with legacy is_final=False",
-            },
-            {
-                "name": "No final indicator",
-                "result": MockResult([MockAlternative("Hello world", 0.9)]),
-                "should_process": True,  # Falls back to deduplication logic
-                "description": "Should process if no final indicator (falls back to deduplication)",
-            },
-        ]
-
         def should_process_response_v2(response):
             """Enhanced logic matching the actual implementation."""
             if not response.results:
@@ -72,85 +88,55 @@ class TestIsFinalAttributeFix(unittest.TestCase):
                 return False
 
             # Check multiple possible final indicators - Google Speech v2 uses isFinal (camelCase)
-            is_final_result = False
-
-            if hasattr(result, "isFinal"):
-                is_final_result = result.isFinal
-            elif hasattr(result, "is_final"):  # Fallback for older versions
-                is_final_result = result.is_final
-            else:
-                # Falls back to deduplication logic
-                is_final_result = True
+            is_final_result = getattr(result, "isFinal", _MISSING)
+            if is_final_result is _MISSING:
+                # Fallback for older versions; with no indicator at all, falls back to
+                # deduplication logic
+                is_final_result = getattr(result, "is_final", True)
 
             alternative = result.alternatives[0]
             confidence = getattr(alternative, "confidence", 0.0)
-            transcript = alternative.transcript.strip()
+            transcript = alternative.transcript
+            # Strip only when there is edge whitespace, sparing the copy for clean transcripts
+            if transcript[:1].isspace() or transcript[-1:].isspace():
+                transcript = transcript.strip()
 
             return is_final_result and confidence > 0.5 and len(transcript) > 0
 
         # Test each scenario
-        for scenario in test_scenarios:
-            with self.subTest(scenario=scenario["name"]):
-                response = MockResponse([scenario["result"]])
+        for name, result, expected, description in FINAL_INDICATOR_SCENARIOS:
+            with self.subTest(scenario=name):
+                response = MockResponse([result])
                 should_process = should_process_response_v2(response)
 
-                self.assertEqual(
-                    should_process,
-                    scenario["should_process"],
-                    f"Failed for {scenario['description']}",
-                )
+                self.assertEqual(should_process, expected, f"Failed for {description}")
 
     def test_user_scenario_isfinal_fix(self):
         """Test the user's scenario with the isFinal fix."""
         # Simulate the user's problematic stream with proper isFinal values
+        # (transcript, isFinal, confidence) per streamed result
         user_stream = [
             # Interim results (isFinal=False) - should be ignored
-            {"transcript": "At this point", "isFinal": False, "confidence": 0.8},
-            {"transcript": "At this point. At this point", "isFinal": False, "confidence": 0.8},
-            {
-                "transcript": "At this point. At this point, at this point",
-                "isFinal": False,
-                "confidence": 0.8,
-            },
-            {
-                "transcript": "At this point. At this point, at this point, I at this point",
-                "isFinal": False,
-                "confidence": 0.8,
-            },
+            ("At this point", False, 0.8),
+            ("At this point. At this point", False, 0.8),
+            ("At this point. At this point, at this point", False, 0.8),
+            ("At this point. At this point, at this point, I at this point", False, 0.8),
             # Final result (isFinal=True) - should be processed
-            {
-                "transcript": "At this point, I am wondering if this is working properly.",
-                "isFinal": True,
-                "confidence": 0.9,
-            },
+            ("At this point, I am wondering if this is working properly.", True, 0.9),
             # Another set of interim results
-            {"transcript": "Wonderful, this point", "isFinal": False, "confidence": 0.8},
-            {
-                "transcript": "Wonderful, this point. I am wondering",
-                "isFinal": False,
-                "confidence": 0.8,
-            },
+            ("Wonderful, this point", False, 0.8),
+            ("Wonderful, this point. I am wondering", False, 0.8),
             # Final result
-            {
-                "transcript": "Wonderful, this is working much better now.",
-                "isFinal": True,
-                "confidence": 0.9,
-            },
+            ("Wonderful, this is working much better now.", True, 0.9),
         ]
 
         def process_with_isfinal_fix(stream):
             """Process stream with the isFinal fix."""
-            processed = []
-
-            for item in stream:
-                transcript = item["transcript"]
-                is_final = item["isFinal"]
-                confidence = item["confidence"]
-
-                if is_final and confidence > 0.5 and transcript.strip():
-                    processed.append(transcript)
-
-            return processed
+            return [
+                transcript
+                for transcript, is_final, confidence in stream
+                if is_final and confidence > 0.5 and transcript.strip()
+            ]
 
         processed = process_with_isfinal_fix(user_stream)
 
@@ -174,22 +160,6 @@ class TestIsFinalAttributeFix(unittest.TestCase):
 
     def test_mixed_attribute_names(self):
         """Test handling of mixed attribute names in the same stream."""
-
-        class MockAlternative:
-            def __init__(self, transcript, confidence):
-                self.transcript = transcript
-                self.confidence = confidence
-
-        class MockResult:
-            def __init__(self, alternatives, **kwargs):
-                self.alternatives = alternatives
-                for key, value in kwargs.items():
-                    setattr(self, key, value)
-
-        class MockResponse:
-            def __init__(self, results):
-                self.results = results
-
         # Mixed stream with both isFinal and is_final
         mixed_stream = [
             MockResponse([MockResult([MockAlternative("Hello", 0.8)], isFinal=False)]),
@@ -214,11 +184,9 @@ class TestIsFinalAttributeFix(unittest.TestCase):
                 confidence = getattr(alternative, "confidence", 0.0)
 
                 # Check both attribute names
-                is_final_result = False
-                if hasattr(result, "isFinal"):
-                    is_final_result = result.isFinal
-                elif hasattr(result, "is_final"):
-                    is_final_result = result.is_final
+                is_final_result = getattr(result, "isFinal", _MISSING)
+                if is_final_result is _MISSING:
+                    is_final_result = getattr(result, "is_final", False)
 
                 if is_final_result and confidence > 0.5 and transcript:
                     processed.append(transcript)
@@ -4,9 +4,41 @@ Tests the fix for "no current event loop in thread" issue.
 """
 
 import asyncio
+import atexit
+import concurrent.futures
 import threading
 import unittest
 
+# Bound once so the callbacks below skip the asyncio module lookup on every transcript
+_get_running_loop = asyncio.get_running_loop
+_create_task = asyncio.create_task
+_run = asyncio.run
+
+# Shared by every thread_pool_callback call, so worker threads start once rather than per transcript
+_CALLBACK_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+atexit.register(_CALLBACK_EXECUTOR.shutdown, wait=False)
+
+# Per-thread event loop for the sync fallback, created on first use in each worker thread
+_thread_state = threading.local()
+
+
+def _thread_loop():
+    """Return this thread's event loop, creating and installing it on first use."""
+    loop = getattr(_thread_state, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        _thread_state.loop = loop
+    return loop
+
+
+def _close_thread_loop():
+    """Close this thread's cached event loop, if it has one; call before the thread exits."""
+    loop = getattr(_thread_state, "loop", None)
+    if loop is not None:
+        asyncio.set_event_loop(None)
+        loop.close()
+
 
 class TestThreadSafeAsyncCallback(unittest.TestCase):
     """Test thread-safe async callback handling."""
@@ -15,7 +47,7 @@ class TestThreadSafeAsyncCallback(unittest.TestCase):
         """Test the event loop issue that occurs in background threads."""
 
         async def mock_async_callback(transcript):
-            await asyncio.sleep(0.01)
+            await asyncio.sleep(0)
             return f"Processed: {transcript}"
 
         def problematic_callback_in_thread(transcript):
@@ -59,31 +91,26 @@ class TestThreadSafeAsyncCallback(unittest.TestCase):
         """Test the thread-safe fix for async callbacks."""
 
         async def mock_async_callback(transcript):
-            await asyncio.sleep(0.01)
+            await asyncio.sleep(0)
             return f"Processed: {transcript}"
 
         def thread_safe_callback(transcript):
             """Thread-safe version that handles the event loop issue."""
+            # Probe for a running loop once, rather than driving the branches by exception
             try:
-                # Try to get current event loop
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    # If loop is running, create task
-                    asyncio.create_task(mock_async_callback(transcript))
-                else:
-                    # If loop is not running, run directly
-                    loop.run_until_complete(mock_async_callback(transcript))
+                loop = _get_running_loop()
             except RuntimeError:
-                # No event loop in current thread, create new one
+                loop = None
+
+            if loop is not None:
+                # If loop is running, create task
+                _create_task(mock_async_callback(transcript))
+            else:
+                # No running loop in current thread, run in a new one
                 try:
-                    new_loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(new_loop)
-                    new_loop.run_until_complete(mock_async_callback(transcript))
-                    new_loop.close()
+                    _run(mock_async_callback(transcript))
                 except Exception as e:
                     return f"Error in new loop: {e}"
-            except Exception as e:
-                return f"Error: {e}"
 
         # Test in main thread
         result = thread_safe_callback("test")
@@ -108,30 +135,31 @@ class TestThreadSafeAsyncCallback(unittest.TestCase):
         """Test alternative approach using thread pool executor."""
 
         async def mock_async_callback(transcript):
-            await asyncio.sleep(0.01)
+            await asyncio.sleep(0)
             return f"Processed: {transcript}"
 
+        # Futures of the transcripts handed to the thread pool, so their outcome can be checked
+        submitted = []
+
         def thread_pool_callback(transcript):
             """Alternative approach using thread pool executor."""
-            import concurrent.futures
-
             try:
-                # Try normal approach first
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    asyncio.create_task(mock_async_callback(transcript))
-                else:
-                    loop.run_until_complete(mock_async_callback(transcript))
+                loop = _get_running_loop()
             except RuntimeError:
+                loop = None
+
+            if loop is not None:
+                # Try normal approach first
+                _create_task(mock_async_callback(transcript))
+            else:
                 # Fallback to thread pool
                 try:
-                    with concurrent.futures.ThreadPoolExecutor() as executor:
-                        executor.submit(asyncio.run, mock_async_callback(transcript))
-                        # Don't wait to avoid blocking, just submit
+                    # Don't wait to avoid blocking, just submit and keep the future
+                    submitted.append(
+                        _CALLBACK_EXECUTOR.submit(_run, mock_async_callback(transcript))
+                    )
                 except Exception as e:
                     return f"Thread pool error: {e}"
-            except Exception as e:
-                return f"Error: {e}"
 
         # Test in background thread
         result_container = []
@@ -148,42 +176,54 @@ class TestThreadSafeAsyncCallback(unittest.TestCase):
         self.assertTrue(len(result_container) > 0)
         self.assertIsNone(result_container[0])  # Success returns None
 
+        # The submitted callback ran to completion in the pool
+        self.assertEqual(len(submitted), 1)
+        self.assertEqual(submitted[0].result(timeout=1), "Processed: test")
+
     def test_simplified_sync_fallback(self):
         """Test simplified approach with sync fallback."""
 
         async def mock_async_callback(transcript):
-            await asyncio.sleep(0.01)
+            await asyncio.sleep(0)
             return f"Processed: {transcript}"
 
         def sync_fallback_callback(transcript):
             """Simplified approach with sync fallback."""
             try:
-                # Try async approach
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    asyncio.create_task(mock_async_callback(transcript))
-                else:
-                    loop.run_until_complete(mock_async_callback(transcript))
+                loop = _get_running_loop()
             except RuntimeError:
-                # Fallback: run in new event loop
-                asyncio.run(mock_async_callback(transcript))
+                loop = None
+
+            try:
+                if loop is not None:
+                    # Try async approach
+                    _create_task(mock_async_callback(transcript))
+                else:
+                    # Fallback: run in this thread's cached event loop
+                    _thread_loop().run_until_complete(mock_async_callback(transcript))
             except Exception as e:
                 return f"Error: {e}"
 
-        # Test in background thread
+        # Test in background thread, with repeated callbacks sharing one loop
         result_container = []
+        loops = []
 
         def run_in_thread():
-            result = sync_fallback_callback("test")
-            result_container.append(result)
+            try:
+                for transcript in ("test", "test again"):
+                    result_container.append(sync_fallback_callback(transcript))
+                    loops.append(_thread_loop())
+            finally:
+                _close_thread_loop()
 
         thread = threading.Thread(target=run_in_thread)
         thread.start()
         thread.join()
 
         # Should succeed (no error)
-        self.assertTrue(len(result_container) > 0)
-        self.assertIsNone(result_container[0])  # Success returns None
+        self.assertEqual(result_container, [None, None])  # Success returns None
+        self.assertIs(loops[0], loops[1])
+        self.assertTrue(loops[0].is_closed())
 
 
 if __name__ == "__main__":
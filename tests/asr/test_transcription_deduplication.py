@@ -15,17 +15,23 @@ class TestTranscriptionDeduplication(unittest.TestCase):
 
         # Simulate Google Speech streaming responses
         class MockResult:
+            __slots__ = ("transcript", "confidence", "is_final")
+
             def __init__(self, transcript, confidence, is_final=False):
                 self.transcript = transcript
                 self.confidence = confidence
                 self.is_final = is_final
 
         class MockAlternative:
+            __slots__ = ("transcript", "confidence")
+
             def __init__(self, transcript, confidence):
                 self.transcript = transcript
                 self.confidence = confidence
 
         class MockResponse:
+            __slots__ = ("results", "is_final")
+
             def __init__(self, results, is_final=False):
                 self.results = results
                 self.is_final = is_final
@@ -71,17 +77,23 @@ class TestTranscriptionDeduplication(unittest.TestCase):
 
         # Mock response structure
         class MockAlternative:
+            __slots__ = ("transcript", "confidence")
+
             def __init__(self, transcript, confidence):
                 self.transcript = transcript
                 self.confidence = confidence
 
         class MockResult:
+            __slots__ = ("alternatives", "is_final", "stability")
+
             def __init__(self, alternatives, is_final=False, stability=0.0):
                 self.alternatives = alternatives
                 self.is_final = is_final
                 self.stability = stability
 
         class MockResponse:
+            __slots__ = ("results",)
+
             def __init__(self, results):
                 self.results = results
 
@@ -113,16 +125,22 @@ class TestTranscriptionDeduplication(unittest.TestCase):
         """Test confidence filtering combined with final result check."""
 
         class MockAlternative:
+            __slots__ = ("transcript", "confidence")
+
             def __init__(self, transcript, confidence):
                 self.transcript = transcript
                 self.confidence = confidence
 
         class MockResult:
+            __slots__ = ("alternatives", "is_final")
+
             def __init__(self, alternatives, is_final=False):
                 self.alternatives = alternatives
                 self.is_final = is_final
 
         class MockResponse:
+            __slots__ = ("results",)
+
             def __init__(self, results):
                 self.results = results
 
@@ -155,7 +173,10 @@ class TestTranscriptionDeduplication(unittest.TestCase):
 
             alternative = result.alternatives[0]
             confidence = alternative.confidence if hasattr(alternative, "confidence") else 0.0
-            transcript = alternative.transcript.strip()
+            transcript = alternative.transcript
+            # Strip only when there is edge whitespace, sparing the copy for clean transcripts
+            if transcript[:1].isspace() or transcript[-1:].isspace():
+                transcript = transcript.strip()
 
             return confidence > min_confidence and len(transcript) > 0
 
@@ -197,12 +218,9 @@ class TestTranscriptionDeduplication(unittest.TestCase):
         # Fixed logic (only final, unique)
         async def fixed_processing():
             seen_transcripts = set()
-            for i, transcript in enumerate(streaming_transcripts):
-                # Only process if it's the last one (final) and not seen before
-                is_final = (i == len(streaming_transcripts) - 2) or (
-                    i == len(streaming_transcripts) - 1
-                )
-                if is_final and transcript not in seen_transcripts:
+            # Only the last two results are final; skip straight to them
+            for transcript in streaming_transcripts[-2:]:
+                if transcript not in seen_transcripts:
                     seen_transcripts.add(transcript)
                     await mock_callback(transcript)
 
@@ -13,9 +13,10 @@ sys.modules["google.cloud.speech_v2.types"] = Mock()
 sys.modules["google.cloud.speech_v2.types.cloud_speech"] = Mock()
 
 from src.asr.google_speech_v2 import GoogleSpeechV2Provider  # noqa: E402
+from src.gateway.audio_session import AudioSession  # noqa: E402
 
 
-class TestFixVerification(unittest.TestCase):
+class TestFixVerification(unittest.IsolatedAsyncioTestCase):
     """Test that the async callback fix works correctly."""
 
     def setUp(self):
@@ -35,7 +36,7 @@ class TestFixVerification(unittest.TestCase):
         # Verify the callback was called
         sync_callback.assert_called_once_with(test_transcript)
 
-    def test_safe_call_callback_with_async_callback(self):
+    async def test_safe_call_callback_with_async_callback(self):
         """Test _safe_call_callback with async callback."""
         # Create an async callback
         async_callback = AsyncMock()
@@ -44,18 +45,14 @@ class TestFixVerification(unittest.TestCase):
         # Call the safe callback method
         test_transcript = "Hello world"
 
-        async def test_async():
-            # This should create a task without error
-            self.provider._safe_call_callback(test_transcript)
-
-            # Give the task time to execute
-            await asyncio.sleep(0.1)
+        # This should create a task without error
+        self.provider._safe_call_callback(test_transcript)
 
-            # Verify the async callback was called
-            async_callback.assert_called_once_with(test_transcript)
+        # Give the task time to execute
+        await asyncio.sleep(0.1)
 
-        # Run the async test
-        asyncio.run(test_async())
+        # Verify the async callback was called
+        async_callback.assert_called_once_with(test_transcript)
 
     def test_safe_call_callback_handles_exceptions(self):
         """Test that _safe_call_callback handles exceptions gracefully."""
@@ -88,35 +85,65 @@ class TestFixVerification(unittest.TestCase):
         self.assertFalse(inspect.iscoroutinefunction(sync_func))
         self.assertTrue(inspect.iscoroutinefunction(async_func))
 
-    def test_integration_scenario(self):
+    async def test_integration_scenario(self):
         """Test the complete integration scenario."""
+        # Mock the async callback (like AudioSession._handle_transcript)
+        mock_websocket = AsyncMock()
+
+        async def mock_handle_transcript(transcript: str):
+            """Mock async _handle_transcript."""
+            if "test" in transcript.lower():
+                await mock_websocket.send_json({"type": "final_transcript", "text": transcript})
+
+        # Set up provider with async callback
+        self.provider.transcription_callback = mock_handle_transcript
+
+        # Call the safe callback method
+        test_transcript = "test transcript"
+        self.provider._safe_call_callback(test_transcript)
 
-        async def test_integration():
-            # Mock the async callback (like AudioSession._handle_transcript)
-            mock_websocket = AsyncMock()
+        # Give the async task time to execute
+        await asyncio.sleep(0.1)
 
-            async def mock_handle_transcript(transcript: str):
-                """Mock async _handle_transcript."""
-                if "test" in transcript.lower():
-                    await mock_websocket.send_json({"type": "final_transcript", "text": transcript})
+        # Verify the websocket was called
+        mock_websocket.send_json.assert_called()
+        call_args = mock_websocket.send_json.call_args[0][0]
+        self.assertEqual(call_args["text"], test_transcript)
 
-            # Set up provider with async callback
-            self.provider.transcription_callback = mock_handle_transcript
+    def test_provider_callback_type_signature(self):
+        """Test start_streaming signature supports optional event emission."""
+        import inspect
+
+        sig = inspect.signature(self.provider.start_streaming)
+
+        self.assertIn("transcription_callback", sig.parameters)
+        self.assertIn("interim_callback", sig.parameters)
+        self.assertIn("emit_events", sig.parameters)
+        self.assertFalse(sig.parameters["emit_events"].default)
+
+    @patch("src.asr.google_speech_v2.logger")
+    def test_transcription_callback_invocation(self, mock_logger):
+        """Test how the transcription callback is currently invoked."""
+        # Mock the callback
+        mock_callback = Mock()
 
-            # Call the safe callback method
-            test_transcript = "test transcript"
-            self.provider._safe_call_callback(test_transcript)
+        # Set up provider with callback
+        self.provider.transcription_callback = mock_callback
 
-            # Give the async task time to execute
-            await asyncio.sleep(0.1)
+        # Simulate the callback invocation (current implementation)
+        test_transcript = "Test transcript"
 
-            # Verify the websocket was called
-            mock_websocket.send_json.assert_called()
-            call_args = mock_websocket.send_json.call_args[0][0]
-            self.assertEqual(call_args["text"], test_transcript)
+        # This is how it's currently called in the provider
+        self.provider.transcription_callback(test_transcript)
+
+        # Verify it was called
+        mock_callback.assert_called_once_with(test_transcript)
+
+    def test_audio_session_handle_transcript_is_async(self):
+        """Test that AudioSession._handle_transcript is indeed async."""
+        import inspect
 
-        # Run the integration test
-        asyncio.run(test_integration())
+        self.assertTrue(inspect.iscoroutinefunction(AudioSession._handle_transcript))
 
 
 if __name__ == "__main__":